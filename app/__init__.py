@@ -1,7 +1,10 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, current_app, request, redirect, url_for, flash
+from sqlalchemy.orm import joinedload, selectinload
 from .config import Config
 from .extensions import db, migrate, login_manager, mail
 from .models import User, Post, Blog
+from .cache import cache
+from .view_counter import view_counter
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -12,6 +15,14 @@ def create_app(config_class=Config):
     mail.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
+    view_counter.init_app(app)
+    app.jinja_env.globals["blog_views"] = view_counter.views
+    from . import images, assets, compression
+    app.jinja_env.globals.update(picture=images.picture, srcset=images.srcset, image_url=images.image_url)
+    app.jinja_env.globals["asset_url"] = assets.asset_url
+    app.after_request(assets.cache_forever)
+    app.view_functions["static"] = assets.send_static
+    app.wsgi_app = compression.Compressor(app.wsgi_app, app.config)
 
     # Blueprints
     from .blueprints.general.routes import bp as general_bp
@@ -32,6 +43,19 @@ def create_app(config_class=Config):
     app.register_blueprint(courses_bp, url_prefix="/courses")
     app.register_blueprint(library_bp, url_prefix="/library")
 
+    # CLI commands
+    from .commands import (counters_cli, search_cli, related_cli, suggestions_cli, events_cli, outbox_cli,
+                           images_cli, library_cli, assets_cli)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(related_cli)
+    app.cli.add_command(suggestions_cli)
+    app.cli.add_command(events_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(library_cli)
+    app.cli.add_command(assets_cli)
+
 
 
 
@@ -39,18 +63,36 @@ def create_app(config_class=Config):
 
     @app.route("/")
     def home():
-        users = User.query.order_by(User.id.desc()).limit(12).all()
-        posts = Post.query.order_by(Post.created_at.desc()).limit(6).all()
-        blogs = Blog.query.order_by(Blog.created_at.desc()).limit(6).all()  # latest 12 users
-        return render_template("home.html", users=users, posts=posts, blogs=blogs)
+        payload = cache.get_or_set("home", current_app.config["HOME_CACHE_TTL"], _home_payload)
+        return render_template("home.html", **payload)
     
 
 
 
+    @app.errorhandler(413)
+    def upload_too_large(error):
+        limit = current_app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)
+        flash(f"That upload is too large (the limit is {limit} MB).", "error")
+        return redirect(request.referrer or url_for("home"))
+
     @app.template_filter('nl2br')
     def nl2br_filter(s):
         if s is None:
             return ""
         return s.replace("\n", "<br>")
 
+    from .tags import slugify
+    app.add_template_filter(slugify, "slugify")
+
     return app
+
+
+def _home_payload():
+    # Everything the home template touches is loaded eagerly, so the objects
+    # stay usable after the session closes and can be served from the cache.
+    users = User.query.options(selectinload(User.profile)) \
+        .order_by(User.id.desc()).limit(12).all()  # latest 12 users
+    posts = Post.query.options(joinedload(Post.user).selectinload(User.profile)) \
+        .order_by(Post.created_at.desc()).limit(6).all()
+    blogs = Blog.query.order_by(Blog.created_at.desc()).limit(6).all()
+    return {"users": users, "posts": posts, "blogs": blogs}
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import subprocess
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.utils import safe_join
+from .compression import compress
+
+# Static files served under fingerprinted names. Their copies live in
+# static/dist/<path>.<hash><ext>; static/dist/manifest.json maps each path
+# to its copy. css/app.css is compiled from src/app.css by Tailwind.
+ASSETS = (
+    "css/app.css",
+    "vendor/alpine-3.14.5.min.js",
+    "vendor/react-18.3.1.min.js",
+    "vendor/react-dom-18.3.1.min.js",
+    "js/hero.js",
+)
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+TAILWIND_INPUT = "src/app.css"
+_HASH_LEN = 12
+
+# A fingerprinted name always has the same content
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Precompressed siblings (<file>.br, <file>.gz) written next to each copy,
+# at maximum compression since it happens once per build
+SIBLINGS = (("br", ".br"), ("gzip", ".gz"))
+_SIBLING_LEVEL = {"br": 11, "gzip": 9}
+
+# static folder -> (manifest mtime, manifest)
+_manifests = {}
+
+
+def _static(path):
+    return os.path.join(current_app.static_folder, path)
+
+
+def manifest():
+    """Source path -> fingerprinted static path, {} before the first build.
+
+    Read once per process; in debug mode it is re-read when the file
+    changes, so `flask assets build` shows up without a restart.
+    """
+    path = _static(f"{DIST_DIR}/{MANIFEST}")
+    cached = _manifests.get(path)
+    if cached is not None and not current_app.debug:
+        return cached[1]
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            cached = _manifests[path] = (mtime, json.load(f))
+    return cached[1]
+
+
+def asset_url(path):
+    """URL of a static asset's fingerprinted copy; the plain static URL if
+    it has not been built (or is not listed in ASSETS)."""
+    return url_for("static", filename=manifest().get(path, path))
+
+
+def cache_forever(response):
+    """after_request: let browsers and proxies keep fingerprinted files
+    without revalidating; a new build references new names."""
+    if request.endpoint == "static" and response.status_code in (200, 206, 304) \
+            and request.view_args.get("filename", "").startswith(f"{DIST_DIR}/"):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def send_static(filename):
+    """The static view. For dist/ files it sends the best precompressed
+    sibling the client accepts, so nothing is compressed per request.
+    (Behind nginx, brotli_static/gzip_static do the same.)"""
+    if not filename.startswith(f"{DIST_DIR}/"):
+        return current_app.send_static_file(filename)
+    accepted = request.accept_encodings
+    for encoding, suffix in SIBLINGS:
+        path = safe_join(current_app.static_folder, filename + suffix)
+        if accepted[encoding] and path and os.path.isfile(path):
+            response = send_from_directory(
+                current_app.static_folder, filename + suffix,
+                mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            )
+            response.content_encoding = encoding
+            break
+    else:
+        response = current_app.send_static_file(filename)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def compile_css():
+    """Rebuild css/app.css with the Tailwind standalone CLI (TAILWIND_BIN)."""
+    command = [current_app.config["TAILWIND_BIN"], "--input", _static(TAILWIND_INPUT),
+               "--output", _static("css/app.css"), "--minify"]
+    if shutil.which(command[0]) is None:
+        raise FileNotFoundError(f"{command[0]} not found; install tailwindcss-bin or set TAILWIND_BIN")
+    subprocess.run(command, check=True, capture_output=True)
+
+
+def _write(path, data):
+    full = _static(path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    tmp = f"{full}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, full)
+
+
+def build(log=None):
+    """Copy every asset to its content-hashed name, with .br/.gz siblings,
+    and write the manifest.
+
+    Copies from the previous build are kept, so pages rendered before a
+    deploy can still load theirs; older ones are removed. Returns the new
+    manifest.
+    """
+    previous = manifest()
+    entries = {}
+    for path in ASSETS:
+        with open(_static(path), "rb") as f:
+            data = f.read()
+        root, ext = os.path.splitext(path)
+        target = f"{DIST_DIR}/{root}.{hashlib.sha256(data).hexdigest()[:_HASH_LEN]}{ext}"
+        if not os.path.exists(_static(target)):
+            for encoding, suffix in SIBLINGS:
+                packed = compress(data, encoding, _SIBLING_LEVEL)
+                if len(packed) < len(data):
+                    _write(target + suffix, packed)
+            _write(target, data)  # last: its presence means the set is complete
+        entries[path] = target
+        if log:
+            log(f"{path} -> {target} ({len(data) // 1024} KB)")
+    _write(f"{DIST_DIR}/{MANIFEST}", json.dumps(entries, indent=2, sort_keys=True).encode() + b"\n")
+    _manifests.clear()
+
+    keep = set(entries.values()) | set(previous.values()) | {f"{DIST_DIR}/{MANIFEST}"}
+    for folder, _, files in os.walk(_static(DIST_DIR)):
+        for name in files:
+            full = os.path.join(folder, name)
+            rel = os.path.relpath(full, current_app.static_folder).replace(os.sep, "/")
+            if rel not in keep and not (rel.endswith((".br", ".gz")) and rel[:-3] in keep):
+                os.unlink(full)
+    return entries
@@ -33,13 +33,14 @@ def register():
         user.set_password(form.password.data)
 
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
 
         # Create empty profile for the user
         db.session.add(Profile(user_id=user.id))
+        # Queued in the outbox, committed together with the account
+        send_verification(user.email)
         db.session.commit()
 
-        # send_verification(user.email)  # Uncomment if email verification enabled
         flash("Welcome! Please verify your email.", "success")
         return redirect(url_for("auth.login"))
 
@@ -93,8 +94,8 @@ def forgot():
     if form.validate_on_submit():
         user = db.session.execute(db.select(User).filter_by(email=form.email.data.lower())).scalar()
         if user:
-            # send_reset(user.email)
-            pass
+            send_reset(user.email)
+            db.session.commit()
         flash("If the email exists, a reset link has been sent.", "success")
         return redirect(url_for("auth.login"))
     return render_template("auth/forgot.html", form=form)
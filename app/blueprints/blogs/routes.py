@@ -1,39 +1,76 @@
-import os
-import uuid
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload
 from app.extensions import db
-from app.models import Blog, BlogLike, BlogComment
+from app.models import User, Profile, Blog, BlogLike, BlogComment, BlogRelated, Tag, blog_tag, bump_counter
 from app.forms import BlogForm, CommentForm
+from app.pagination import keyset_paginate
+from app import search as blog_search
+from app import tags as blog_tags
+from app.view_counter import view_counter
+from app import related as blog_related
+from app import comments as blog_comments
+from app import images
+from app.decorators import conditional
 
 bp = Blueprint("blogs", __name__, template_folder='../../templates/blogs')
 
+RELATED_LIMIT = 3  # related posts under a blog
+
 
 # -----------------------------
 # INDEX (with filters & featured)
 # -----------------------------
 @bp.route("/")
 def index():
-    page = request.args.get("page", 1, type=int)
     category = request.args.get("category")
     search = request.args.get("q")
+    cursor = request.args.get("cursor")
+    snippets = {}
 
-    query = Blog.query.order_by(Blog.created_at.desc())
-
-    if category:
-        query = query.filter(Blog.category == category)
-    if search:
-        query = query.filter(
-            Blog.title.ilike(f"%{search}%") |
-            Blog.body.ilike(f"%{search}%") |
-            Blog.tags.ilike(f"%{search}%")
-        )
-
-    featured = Blog.query.filter_by(is_featured=True).order_by(Blog.created_at.desc()).limit(3).all()
-    blogs = query.paginate(page=page, per_page=10)
-
-    return render_template("blogs/index.html", blogs=blogs, featured=featured, category=category, search=search)
+    if search and blog_search.fts_enabled():
+        # Ranked full-text search (bm25) over the blog_fts index
+        blogs, snippets = blog_search.search_blogs(search, category=category, cursor=cursor, per_page=10)
+    else:
+        query = Blog.query.options(joinedload(Blog.user).selectinload(User.profile))
+        if category:
+            query = query.filter(Blog.category == category)
+        if search:
+            query = query.filter(
+                Blog.title.ilike(f"%{search}%") |
+                Blog.body.ilike(f"%{search}%") |
+                Blog.tags.ilike(f"%{search}%")
+            )
+        blogs = keyset_paginate(query, (Blog.created_at, Blog.id), cursor, per_page=10)
+
+    featured = Blog.query.options(joinedload(Blog.user).selectinload(User.profile)) \
+        .filter_by(is_featured=True).order_by(Blog.created_at.desc()).limit(3).all()
+
+    return render_template("blogs/index.html", blogs=blogs, featured=featured, category=category,
+                           search=search, snippets=snippets, tag_cloud=blog_tags.tag_cloud())
+
+
+@bp.route("/tag/<slug>")
+def by_tag(slug):
+    tag = Tag.query.filter_by(slug=slug).first_or_404()
+    query = Blog.query.options(joinedload(Blog.user).selectinload(User.profile)) \
+        .join(blog_tag, blog_tag.c.blog_id == Blog.id).filter(blog_tag.c.tag_id == tag.id)
+    blogs = keyset_paginate(query, (Blog.created_at, Blog.id), request.args.get("cursor"), per_page=10)
+    return render_template("blogs/index.html", blogs=blogs, featured=[], current_tag=tag,
+                           snippets={}, tag_cloud=blog_tags.tag_cloud())
+
+
+def _save_cover(blog, form):
+    """Store an uploaded cover as renditions; False (with a flash) if the
+    file is not a readable image."""
+    if not form.cover_image.data:
+        return True
+    try:
+        blog.cover_image = images.store(form.cover_image.data.stream, "cover")
+    except images.ImageError:
+        flash("The cover image could not be read. Please upload a JPEG, PNG or WebP file.", "error")
+        return False
+    return True
 
 
 # -----------------------------
@@ -69,25 +106,13 @@ def create():
         blog.set_excerpt()
         blog.set_reading_time()
 
-        # Save cover image if uploaded
-        # Inside create() and edit()
-
-        if form.cover_image.data:
-            filename = secure_filename(form.cover_image.data.filename)
-            unique_name = f"{uuid.uuid4().hex}_{filename}"
-
-            # Save inside static/cover_image/
-            upload_dir = os.path.join(current_app.root_path, "static", "cover_image")
-            os.makedirs(upload_dir, exist_ok=True)
-
-            upload_path = os.path.join(upload_dir, unique_name)
-            form.cover_image.data.save(upload_path)
-
-            # Store relative path for url_for('static', filename=...)
-            blog.cover_image = f"cover_image/{unique_name}"
-
+        if not _save_cover(blog, form):
+            return render_template("blogs/create.html", form=form, blog=None)
 
         db.session.add(blog)
+        blog_tags.sync_blog_tags(blog)
+        db.session.flush()
+        blog_related.update_for(blog)
         db.session.commit()
         flash("Blog published.", "success")
         return redirect(url_for("blogs.detail", blog_id=blog.id))
@@ -97,46 +122,71 @@ def create():
 # -----------------------------
 # BLOG DETAIL
 # -----------------------------
+def _detail_version(blog_id):
+    viewer = current_user.id if current_user.is_authenticated else 0
+    liked = db.select(BlogLike.id).where(BlogLike.blog_id == blog_id, BlogLike.user_id == viewer).exists()
+    # The author's name and avatar and the related posts are rendered too
+    row = db.session.execute(
+        db.select(Blog.updated_at, Blog.like_count, Blog.comment_count, liked, Blog.category,
+                  User.email, Profile.first_name, Profile.photo_url)
+        .join(User, Blog.user_id == User.id)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .where(Blog.id == blog_id)
+    ).first()
+    if row is None:
+        return None
+    # Count the view (buffered, flushed in batches) here, so revalidated
+    # pages count too; the count itself is left out of the ETag
+    view_counter.record(blog_id)
+    return tuple(row) + _related_version(blog_id, row.category)
+
+
+def _related_version(blog_id, category):
+    """(id, updated_at) of the related posts detail() shows, same fallback."""
+    shown = db.select(Blog.id, Blog.updated_at).limit(RELATED_LIMIT)
+    rows = db.session.execute(
+        shown.join(BlogRelated, BlogRelated.related_id == Blog.id)
+        .where(BlogRelated.blog_id == blog_id)
+        .order_by(BlogRelated.score.desc())
+    ).all()
+    if not rows:
+        rows = db.session.execute(
+            shown.where(Blog.category == category, Blog.id != blog_id).order_by(Blog.created_at.desc())
+        ).all()
+    return tuple(map(tuple, rows))
+
+
 @bp.route("/<int:blog_id>")
+@conditional(_detail_version)
 def detail(blog_id):
     blog = Blog.query.get_or_404(blog_id)
-
-    # Count view
-    blog.views = (blog.views or 0) + 1
-    db.session.commit()
-
     form = CommentForm()
-    comments = BlogComment.query.filter_by(blog_id=blog.id, parent_id=None) \
-        .order_by(BlogComment.created_at.desc()).all()
 
-    # Related posts by category
-    related = Blog.query.filter(
-        Blog.category == blog.category,
-        Blog.id != blog.id
-    ).order_by(Blog.created_at.desc()).limit(3).all()
+    # Related posts: precomputed similarity neighbours, else same category
+    related = blog_related.related_blogs(blog, limit=RELATED_LIMIT)
+    if not related:
+        related = Blog.query.filter(
+            Blog.category == blog.category,
+            Blog.id != blog.id
+        ).order_by(Blog.created_at.desc()).limit(RELATED_LIMIT).all()
 
-    return render_template("blogs/detail.html", blog=blog, form=form, comments=comments, related_posts=related)
+    return render_template("blogs/detail.html", blog=blog, form=form, related_posts=related)
 
 
 # -----------------------------
 # COMMENTS (AJAX)
 # -----------------------------
+def _comments_version(blog_id):
+    newest = db.select(db.func.max(BlogComment.id)).where(BlogComment.blog_id == blog_id).scalar_subquery()
+    row = db.session.execute(db.select(Blog.comment_count, newest).where(Blog.id == blog_id)).first()
+    return tuple(row) if row else None
+
+
 @bp.route("/<int:blog_id>/comments")
+@conditional(_comments_version)
 def get_comments(blog_id):
     blog = Blog.query.get_or_404(blog_id)
-
-    def serialize(c):
-        return {
-            "id": c.id,
-            "body": c.body,
-            "user": c.user.profile.first_name or c.user.email,
-            "created_at": c.created_at.strftime("%Y-%m-%d %H:%M"),
-            "replies": [serialize(r) for r in c.replies.order_by(BlogComment.created_at.asc())]
-        }
-
-    comments = BlogComment.query.filter_by(blog_id=blog.id, parent_id=None) \
-        .order_by(BlogComment.created_at.desc()).all()
-    return jsonify([serialize(c) for c in comments])
+    return jsonify(blog_comments.load_comments(BlogComment, request.args, blog_id=blog.id))
 
 
 @bp.route("/<int:blog_id>/comment", methods=["POST"])
@@ -155,18 +205,20 @@ def comment(blog_id):
     except (ValueError, TypeError):
         parent_id = None
 
-    comment = BlogComment(user_id=current_user.id, blog_id=blog.id, body=body.strip(), parent_id=parent_id)
+    parent = blog_comments.find_parent(BlogComment, parent_id, blog_id=blog.id)
+
+    comment = BlogComment(user_id=current_user.id, blog_id=blog.id, body=body.strip(),
+                          parent_id=parent.id if parent else None)
     db.session.add(comment)
+    db.session.flush()
+    blog_comments.set_path(comment, parent)
+    bump_counter(blog, "comment_count")
+    if parent is not None:
+        bump_counter(parent, "reply_count")
     db.session.commit()
 
     if request.is_json:
-        return jsonify({
-            "id": comment.id,
-            "body": comment.body,
-            "user": current_user.profile.first_name or current_user.email,
-            "created_at": comment.created_at.strftime("%Y-%m-%d %H:%M"),
-            "replies": []
-        })
+        return jsonify(blog_comments.serialize(comment))
 
     flash("Comment added.", "success")
     return redirect(url_for("blogs.detail", blog_id=blog.id))
@@ -182,10 +234,12 @@ def like(blog_id):
     existing = BlogLike.query.filter_by(user_id=current_user.id, blog_id=blog.id).first()
     if existing:
         db.session.delete(existing)
+        bump_counter(blog, "like_count", -1)
         flash("Like removed.", "info")
     else:
         like = BlogLike(user_id=current_user.id, blog_id=blog.id)
         db.session.add(like)
+        bump_counter(blog, "like_count")
         flash("Liked.", "success")
     db.session.commit()
     return redirect(url_for("blogs.detail", blog_id=blog.id))
@@ -227,24 +281,13 @@ def edit(blog_id):
         blog.is_featured = form.is_featured.data
         blog.set_excerpt()
         blog.set_reading_time()
+        blog_tags.sync_blog_tags(blog)
 
-       # Inside create() and edit()
-
-        if form.cover_image.data:
-            filename = secure_filename(form.cover_image.data.filename)
-            unique_name = f"{uuid.uuid4().hex}_{filename}"
-
-            # Save inside static/cover_image/
-            upload_dir = os.path.join(current_app.root_path, "static", "cover_image")
-            os.makedirs(upload_dir, exist_ok=True)
-
-            upload_path = os.path.join(upload_dir, unique_name)
-            form.cover_image.data.save(upload_path)
-
-            # Store relative path for url_for('static', filename=...)
-            blog.cover_image = f"cover_image/{unique_name}"
-
+        if not _save_cover(blog, form):
+            return render_template("blogs/edit.html", form=form, blog=blog)
 
+        db.session.flush()
+        blog_related.update_for(blog)
         db.session.commit()
         flash("Blog updated.", "success")
         return redirect(url_for("blogs.detail", blog_id=blog.id))
@@ -258,6 +301,8 @@ def delete(blog_id):
     blog = Blog.query.get_or_404(blog_id)
     if not (current_user.id == blog.user_id or getattr(current_user, "is_admin", False)):
         abort(403)
+    blog_tags.clear_blog_tags(blog)
+    blog_related.forget(blog)
     db.session.delete(blog)
     db.session.commit()
     flash("Blog deleted.", "success")
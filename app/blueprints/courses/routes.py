@@ -3,18 +3,26 @@ from flask_login import login_required, current_user
 from app.extensions import db
 from app.models import Course, CourseRegistration
 from app.forms import CourseForm
-from app.decorators import admin_required
+from app.decorators import admin_required, conditional
+from app.pagination import keyset_paginate
 #from app.mailer import send_course_enrollment
 
 bp = Blueprint("courses", __name__, template_folder='../../templates/courses')
 
 @bp.route("/")
 def index():
-    page = request.args.get("page", 1, type=int)
-    courses = Course.query.order_by(Course.created_at.desc()).paginate(page=page, per_page=9)
+    courses = keyset_paginate(Course.query, (Course.created_at, Course.id), request.args.get("cursor"), per_page=9)
     return render_template("courses/index.html", courses=courses)
 
+def _detail_version(course_id):
+    viewer = current_user.id if current_user.is_authenticated else 0
+    enrolled = db.select(CourseRegistration.id).where(
+        CourseRegistration.course_id == course_id, CourseRegistration.user_id == viewer).exists()
+    row = db.session.execute(db.select(Course.updated_at, enrolled).where(Course.id == course_id)).first()
+    return tuple(row) if row else None
+
 @bp.route("/<int:course_id>")
+@conditional(_detail_version)
 def detail(course_id):
     course = Course.query.get_or_404(course_id)
     user_is_enrolled = False
@@ -2,26 +2,41 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from datetime import datetime
 from app.extensions import db
-from app.models import Event, EventRegistration
+from app.models import Event, EventRegistration, EventWaitlist
 from app.forms import EventForm
-from app.decorators import admin_required
-from app.mailer import send_event_registration
+from app.decorators import admin_required, conditional
+from app.pagination import keyset_paginate
+from app import seats
 
 bp = Blueprint("events", __name__, template_folder='../../templates/events')
 
 @bp.route("/")
 def index():
-    page = request.args.get("page", 1, type=int)
-    events = Event.query.order_by(Event.date.asc()).paginate(page=page, per_page=9)
+    events = keyset_paginate(Event.query, (Event.date, Event.id), request.args.get("cursor"),
+                             per_page=9, descending=False)
     return render_template("events/index.html", events=events, now=datetime.utcnow())
 
+def _detail_version(event_id):
+    viewer = current_user.id if current_user.is_authenticated else 0
+    registered = db.select(EventRegistration.id).where(
+        EventRegistration.event_id == event_id, EventRegistration.user_id == viewer).exists()
+    waitlisted = db.select(EventWaitlist.id).where(
+        EventWaitlist.event_id == event_id, EventWaitlist.user_id == viewer).exists()
+    row = db.session.execute(
+        db.select(Event.updated_at, Event.seats_taken, registered, waitlisted).where(Event.id == event_id)
+    ).first()
+    return tuple(row) if row else None
+
 @bp.route("/<int:event_id>")
+@conditional(_detail_version)
 def detail(event_id):
     event = Event.query.get_or_404(event_id)
-    user_is_registered = False
+    user_is_registered = user_is_waitlisted = False
     if current_user.is_authenticated:
         user_is_registered = EventRegistration.query.filter_by(user_id=current_user.id, event_id=event.id).first() is not None
-    return render_template("events/detail.html", event=event, user_is_registered=user_is_registered)
+        user_is_waitlisted = not user_is_registered and seats.is_waitlisted(event, current_user)
+    return render_template("events/detail.html", event=event, user_is_registered=user_is_registered,
+                           user_is_waitlisted=user_is_waitlisted)
 
 @bp.route("/create", methods=["GET","POST"])
 @login_required
@@ -59,6 +74,7 @@ def edit(event_id):
         event.is_online = form.is_online.data
         event.capacity = form.capacity.data
         db.session.commit()
+        seats.fill_from_waitlist(event)
         flash('Event updated.', 'success')
         return redirect(url_for('events.detail', event_id=event.id))
     return render_template("events/edit.html", form=form, event=event)
@@ -77,16 +93,21 @@ def delete(event_id):
 @login_required
 def register(event_id):
     event = Event.query.get_or_404(event_id)
-    if event.spots_left <= 0:
-        flash('This event is full.', 'warning')
-        return redirect(url_for('events.detail', event_id=event.id))
-    existing = EventRegistration.query.filter_by(user_id=current_user.id, event_id=event.id).first()
-    if existing:
+    result = seats.reserve(event, current_user)
+    if result == seats.REGISTERED:
+        flash('Registered successfully 🎉', 'success')
+    elif result == seats.WAITLISTED:
+        flash('This event is full. You are on the waitlist and will be registered if a spot opens up.', 'warning')
+    elif result == seats.ALREADY_WAITLISTED:
+        flash('You are already on the waitlist for this event.', 'info')
+    else:
         flash('You are already registered for this event.', 'info')
-        return redirect(url_for('events.detail', event_id=event.id))
-    reg = EventRegistration(user_id=current_user.id, event_id=event.id)
-    db.session.add(reg)
-    db.session.commit()
-    #send_event_registration(current_user, event)
-    flash('Registered successfully 🎉', 'success')
+    return redirect(url_for('events.detail', event_id=event.id))
+
+@bp.route("/<int:event_id>/cancel", methods=["POST"])
+@login_required
+def cancel(event_id):
+    event = Event.query.get_or_404(event_id)
+    seats.cancel(event, current_user)
+    flash('Your registration has been cancelled.', 'info')
     return redirect(url_for('events.detail', event_id=event.id))
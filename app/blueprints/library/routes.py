@@ -1,10 +1,11 @@
-import os
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, send_from_directory
+from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from app.extensions import db
-from app.models import AdminPDF, UserPDF
+from app.models import User, AdminPDF, UserPDF
+from app.pagination import keyset_paginate
+from app import pdfs as pdf_store, pdf_index
 from .forms import PDFUploadForm
-from werkzeug.utils import safe_join
 
 bp = Blueprint("library", __name__, template_folder='../../templates/library')
 
@@ -17,10 +18,38 @@ def index():
     return redirect(url_for("library.readings"))
 
 
+# ?sort= for the listings: the keyset columns and whether they run descending.
+# Size is coalesced because rows from before blob storage have none.
+LISTING_SORTS = {
+    "newest": (lambda m: (m.uploaded_at, m.id), True),
+    "oldest": (lambda m: (m.uploaded_at, m.id), False),
+    "title": (lambda m: (m.title, m.id), False),
+    "largest": (lambda m: (db.func.coalesce(m.size, 0), m.id), True),
+}
+
+
+def _listing(query, model):
+    """One keyset page of a library listing, sorted by ?sort= (the page's
+    ``sort`` attribute is the key actually used)."""
+    sort = request.args.get("sort")
+    if sort not in LISTING_SORTS:
+        sort = "newest"
+    columns, descending = LISTING_SORTS[sort]
+    row_key = (lambda pdf: (pdf.size or 0, pdf.id)) if sort == "largest" else None
+    page = keyset_paginate(query, columns(model), request.args.get("cursor"), per_page=20,
+                           descending=descending, row_key=row_key)
+    page.sort = sort
+    return page
+
+
 @bp.route("/readings")
 def readings():
-    pdfs = AdminPDF.query.order_by(AdminPDF.uploaded_at.desc()).all()
-    return render_template("library/readings.html", pdfs=pdfs)
+    q = request.args.get("q", "").strip()
+    if q:
+        hits, pdfs = pdf_index.search_pages(AdminPDF, q, request.args.get("cursor")), None
+    else:
+        hits, pdfs = None, _listing(AdminPDF.query, AdminPDF)
+    return render_template("library/readings.html", pdfs=pdfs, q=q, hits=hits, sorts=LISTING_SORTS)
 
 
 @bp.route("/readings/upload", methods=["GET", "POST"])
@@ -33,15 +62,14 @@ def upload_reading():
     form = PDFUploadForm()
     if form.validate_on_submit():
         file = form.file.data
-        filename = file.filename
-
-        upload_folder = current_app.config["UPLOAD_FOLDER"]
-        os.makedirs(upload_folder, exist_ok=True)
-
-        path = os.path.join(upload_folder, filename)
-        file.save(path)
-
-        pdf = AdminPDF(title=form.title.data, description=form.description.data, filename=filename)
+        try:
+            sha256, size, page_count = pdf_store.store(file.stream)
+        except pdf_store.PDFError:
+            flash("That file is not a PDF.", "danger")
+            return render_template("library/upload.html", form=form, heading="Upload Reading (Admin)")
+
+        pdf = AdminPDF(title=form.title.data, description=form.description.data,
+                       filename=file.filename, sha256=sha256, size=size, page_count=page_count)
         db.session.add(pdf)
         db.session.commit()
 
@@ -53,8 +81,19 @@ def upload_reading():
 
 @bp.route("/user")
 def user_library():
-    pdfs = UserPDF.query.order_by(UserPDF.uploaded_at.desc()).all()
-    return render_template("library/user_library.html", pdfs=pdfs)
+    q = request.args.get("q", "").strip()
+    # ?owner=<user id> narrows the listing to one person's uploads
+    owner = request.args.get("owner", type=int)
+    owner = db.session.get(User, owner) if owner else None
+    if q:
+        hits, pdfs = pdf_index.search_pages(UserPDF, q, request.args.get("cursor")), None
+    else:
+        query = UserPDF.query.options(joinedload(UserPDF.user).joinedload(User.profile))
+        if owner:
+            query = query.filter(UserPDF.user_id == owner.id)
+        hits, pdfs = None, _listing(query, UserPDF)
+    return render_template("library/user_library.html", pdfs=pdfs, q=q, hits=hits, owner=owner,
+                           sorts=LISTING_SORTS)
 
 
 @bp.route("/user/upload", methods=["GET", "POST"])
@@ -63,15 +102,14 @@ def upload_user_pdf():
     form = PDFUploadForm()
     if form.validate_on_submit():
         file = form.file.data
-        filename = file.filename
-
-        upload_folder = current_app.config["UPLOAD_FOLDER"]
-        os.makedirs(upload_folder, exist_ok=True)
-
-        path = os.path.join(upload_folder, filename)
-        file.save(path)
-
-        pdf = UserPDF(user_id=current_user.id, title=form.title.data, description=form.description.data, filename=filename)
+        try:
+            sha256, size, page_count = pdf_store.store(file.stream)
+        except pdf_store.PDFError:
+            flash("That file is not a PDF.", "danger")
+            return render_template("library/upload.html", form=form, heading="Upload to My Library")
+
+        pdf = UserPDF(user_id=current_user.id, title=form.title.data, description=form.description.data,
+                      filename=file.filename, sha256=sha256, size=size, page_count=page_count)
         db.session.add(pdf)
         db.session.commit()
 
@@ -90,8 +128,7 @@ def delete_pdf(kind, pdf_id):
             flash("Only admins can delete admin PDFs.", "danger")
             return redirect(url_for("library.readings"))
 
-        db.session.delete(pdf)
-        db.session.commit()
+        _delete(pdf)
         flash("Admin PDF deleted.", "info")
         return redirect(url_for("library.readings"))
 
@@ -101,27 +138,26 @@ def delete_pdf(kind, pdf_id):
             flash("You don't have permission to delete this file.", "danger")
             return redirect(url_for("library.user_library"))
 
-        db.session.delete(pdf)
-        db.session.commit()
+        _delete(pdf)
         flash("PDF deleted.", "info")
         return redirect(url_for("library.user_library"))
 
 
 
-@bp.route("/download/<string:kind>/<filename>")
-@login_required
-def download_pdf(kind, filename):
-    upload_folder = current_app.config["UPLOAD_FOLDER"]
-
-    # Make sure we have an absolute path
-    if not os.path.isabs(upload_folder):
-        upload_folder = os.path.join(current_app.root_path, upload_folder)
-
-    safe_path = safe_join(upload_folder, filename)
-    if not os.path.exists(safe_path):
-        flash("File not found.", "danger")
-        return redirect(url_for("library.user_library"))
-
-    return send_from_directory(upload_folder, filename, as_attachment=True)
+def _delete(pdf):
+    """Delete a PDF row; its blob file goes when no other row shares it."""
+    last = pdf_store.release(pdf.sha256)
+    if last:
+        pdf_index.forget(pdf.sha256)
+    db.session.delete(pdf)
+    db.session.commit()
+    if last:
+        pdf_store.unlink(pdf.sha256)
 
 
+@bp.route("/download/<any(admin,user):kind>/<int:pdf_id>")
+@login_required
+def download_pdf(kind, pdf_id):
+    pdf = (AdminPDF if kind == "admin" else UserPDF).query.get_or_404(pdf_id)
+    # ?inline=1 opens it in the browser's viewer instead of saving it
+    return pdf_store.send(pdf, as_attachment=not request.args.get("inline"))
@@ -1,17 +1,29 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from app.extensions import db
-from app.models import Post, PostLike, PostComment
+from app.models import User, Profile, Post, PostLike, PostComment, bump_counter
 from app.forms import PostForm, CommentForm
+from app.pagination import keyset_paginate
+from app import feed, suggestions
+from app import comments as post_comments
+from app.decorators import conditional
 
 bp = Blueprint("posts", __name__, template_folder='../../templates/posts')
 
 @bp.route("/")
 def index():
-    page = request.args.get("page", 1, type=int)
-    posts = Post.query.order_by(Post.created_at.desc()).paginate(page=page, per_page=10)
+    query = Post.query.options(joinedload(Post.user).selectinload(User.profile))
+    posts = keyset_paginate(query, (Post.created_at, Post.id), request.args.get("cursor"), per_page=10)
     return render_template("posts/index.html", posts=posts)
 
+@bp.route("/feed")
+@login_required
+def following_feed():
+    posts, next_cursor = feed.load_feed(current_user, request.args.get("cursor"))
+    suggested = suggestions.suggested_users(current_user)
+    return render_template("posts/feed.html", posts=posts, next_cursor=next_cursor, suggested=suggested)
+
 @bp.route("/create", methods=["GET", "POST"])
 @login_required
 def create():
@@ -19,47 +31,47 @@ def create():
     if form.validate_on_submit():
         post = Post(user_id=current_user.id, body=form.body.data)
         db.session.add(post)
+        db.session.flush()
+        feed.fan_out_post(post, current_user)
         db.session.commit()
         flash("Post created.", "success")
         return redirect(url_for("posts.index"))
     return render_template("posts/create.html", form=form)
 
 
+def _detail_version(post_id):
+    # The author's name and avatar are rendered too
+    row = db.session.execute(
+        db.select(Post.updated_at, Post.like_count, Post.comment_count,
+                  User.email, Profile.first_name, Profile.photo_url)
+        .join(User, Post.user_id == User.id)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .where(Post.id == post_id)
+    ).first()
+    return tuple(row) if row else None
+
+
 @bp.route("/posts/<int:post_id>")
+@conditional(_detail_version)
 def detail(post_id):
     post = Post.query.get_or_404(post_id)
 
-    # Load only top-level comments (replies handled in template/JS)
-    comments = (
-        PostComment.query.filter_by(post_id=post.id, parent_id=None)
-        .order_by(PostComment.created_at.desc())
-        .all()
-    )
-
+    # Comments are fetched page by page by the Alpine.js component
     form = CommentForm()
-    return render_template("posts/detail.html", post=post, form=form, comments=comments)
+    return render_template("posts/detail.html", post=post, form=form)
+
+def _comments_version(post_id):
+    newest = db.select(db.func.max(PostComment.id)).where(PostComment.post_id == post_id).scalar_subquery()
+    row = db.session.execute(db.select(Post.comment_count, newest).where(Post.id == post_id)).first()
+    return tuple(row) if row else None
+
 
 # ✅ GET all comments (AJAX)
 @bp.route("/<int:post_id>/comments")
+@conditional(_comments_version)
 def get_comments(post_id):
     post = Post.query.get_or_404(post_id)
-
-    def serialize(c):
-        return {
-            "id": c.id,
-            "body": c.body,
-            "user": c.user.profile.first_name or c.user.email,
-            "created_at": c.created_at.strftime("%Y-%m-%d %H:%M"),
-            "replies": [serialize(r) for r in sorted(c.replies, key=lambda r: r.created_at)]
-        }
-
-    comments = (
-        PostComment.query.filter_by(post_id=post.id, parent_id=None)
-        .order_by(PostComment.created_at.desc())
-        .all()
-    )
-
-    return jsonify([serialize(c) for c in comments])
+    return jsonify(post_comments.load_comments(PostComment, request.args, post_id=post.id))
 
 
 # ✅ POST a new comment
@@ -84,24 +96,24 @@ def comment(post_id):
 
     # Convert parent_id safely
     parent_id = int(parent_id) if parent_id and str(parent_id).isdigit() else None
+    parent = post_comments.find_parent(PostComment, parent_id, post_id=post.id)
 
     comment = PostComment(
         user_id=current_user.id,
         post_id=post.id,
         body=body,
-        parent_id=parent_id,
+        parent_id=parent.id if parent else None,
     )
     db.session.add(comment)
+    db.session.flush()
+    post_comments.set_path(comment, parent)
+    bump_counter(post, "comment_count")
+    if parent is not None:
+        bump_counter(parent, "reply_count")
     db.session.commit()
 
     if request.is_json:
-        return jsonify({
-            "id": comment.id,
-            "body": comment.body,
-            "user": current_user.profile.first_name or current_user.email,
-            "created_at": comment.created_at.strftime("%Y-%m-%d %H:%M"),
-            "replies": []
-        })
+        return jsonify(post_comments.serialize(comment))
 
     flash("Comment added.", "success")
     return redirect(url_for("posts.detail", post_id=post.id))
@@ -114,11 +126,13 @@ def like(post_id):
     existing = PostLike.query.filter_by(user_id=current_user.id, post_id=post.id).first()
     if existing:
         db.session.delete(existing)
+        bump_counter(post, "like_count", -1)
         db.session.commit()
         flash("Like removed.", "success")
     else:
         like = PostLike(user_id=current_user.id, post_id=post.id)
         db.session.add(like)
+        bump_counter(post, "like_count")
         db.session.commit()
         flash("Liked.", "success")
     return redirect(url_for("posts.detail", post_id=post.id))
@@ -143,6 +157,7 @@ def delete(post_id):
     post = Post.query.get_or_404(post_id)
     if not (current_user.id == post.user_id or getattr(current_user, "is_admin", False)):
         abort(403)
+    feed.forget_post(post)
     db.session.delete(post)
     db.session.commit()
     flash("Post deleted.", "success")
@@ -1,12 +1,12 @@
-import os
-import base64
-import uuid
-import time
-from flask import Blueprint, render_template, abort, request, redirect, url_for, flash
-from app.models import User, Post, Blog, UserPDF, Profile
+from flask import Blueprint, render_template, abort, request, redirect, url_for, flash, jsonify
+from werkzeug.datastructures import FileStorage
+from sqlalchemy.orm import selectinload
+from app.models import User, Post, Blog, UserPDF, Profile, followers
 from app.extensions import db
 from flask_login import current_user, login_required
 from app.forms import ProfileForm
+from app.pagination import keyset_paginate
+from app import feed, suggestions, images
 
 bp = Blueprint("users", __name__, template_folder='../../templates/users')
 
@@ -14,27 +14,54 @@ bp = Blueprint("users", __name__, template_folder='../../templates/users')
 @bp.route("/user/<int:user_id>")
 def profile(user_id):
     user = User.query.get_or_404(user_id)
+    stats = _profile_stats(user)
 
-    total_likes = sum([p.likes.count() for p in user.posts]) + sum([b.likes.count() for b in user.blogs])
-    followers_count = user.followers.count()
-    following_count = user.following.count()
-
-    posts = user.posts.order_by(Post.created_at.desc()).all()
-    blogs = user.blogs.order_by(Blog.created_at.desc()).all()
-    pdfs = UserPDF.query.filter_by(user_id=user.id).order_by(UserPDF.uploaded_at.desc()).all()
-
+    # Posts, blogs and PDFs are fetched tab by tab from profile_tab
     return render_template(
         "users/profile.html",
         user=user,
-        total_likes=total_likes,
-        followers_count=followers_count,
-        following_count=following_count,
-        posts=posts,
-        blogs=blogs,
-        pdfs=pdfs
+        total_likes=stats.total_likes,
+        followers_count=user.follower_count,
+        following_count=user.following_count,
+        stats=stats,
     )
 
 
+def _profile_stats(user):
+    """Likes received and posts/blogs/PDFs authored, in a single query."""
+    def total(column, model):
+        return db.select(db.func.coalesce(db.func.sum(column), 0)) \
+            .where(model.user_id == user.id).scalar_subquery()
+
+    def count(model):
+        return db.select(db.func.count()).where(model.user_id == user.id).scalar_subquery()
+
+    return db.session.execute(db.select(
+        (total(Post.like_count, Post) + total(Blog.like_count, Blog)).label("total_likes"),
+        count(Post).label("posts"),
+        count(Blog).label("blogs"),
+        count(UserPDF).label("pdfs"),
+    )).one()
+
+
+PROFILE_TABS = {
+    "posts": (Post, (Post.created_at, Post.id)),
+    "blogs": (Blog, (Blog.created_at, Blog.id)),
+    "pdfs": (UserPDF, (UserPDF.uploaded_at, UserPDF.id)),
+}
+
+
+@bp.route("/user/<int:user_id>/<any(posts, blogs, pdfs):tab>")
+def profile_tab(user_id, tab):
+    """One keyset page of a profile tab, as an HTML fragment plus cursor."""
+    user = User.query.get_or_404(user_id)
+    model, columns = PROFILE_TABS[tab]
+    cursor = request.args.get("cursor")
+    page = keyset_paginate(model.query.filter_by(user_id=user.id), columns, cursor, per_page=10)
+    html = render_template(f"users/_profile_{tab}.html", user=user, items=page.items, first_page=not cursor)
+    return jsonify({"html": html, "next_cursor": page.next_cursor})
+
+
 @bp.route("/edit", methods=["GET", "POST"])
 @login_required
 def edit_profile():
@@ -50,25 +77,20 @@ def edit_profile():
     if form.validate_on_submit():
         form.populate_obj(profile)
 
-        # Profile photo
-        photo_data = request.form.get('photo')
-        if photo_data and photo_data.startswith('data:image'):
-            filename = f"profile_{uuid.uuid4().hex}.jpg"
-            path = os.path.join('app', 'static', 'pro_pics', filename)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            with open(path, 'wb') as f:
-                f.write(base64.b64decode(photo_data.split(',', 1)[1]))
-            profile.photo_url = url_for('static', filename=f'pro_pics/{filename}') + f"?v={int(time.time())}"
-
-        # Cover image
-        cover_data = request.form.get('cover')
-        if cover_data and cover_data.startswith('data:image'):
-            filename = f"cover_{uuid.uuid4().hex}.jpg"
-            path = os.path.join('app', 'static', 'cover_pics', filename)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            with open(path, 'wb') as f:
-                f.write(base64.b64decode(cover_data.split(',', 1)[1]))
-            profile.cover_url = url_for('static', filename=f'cover_pics/{filename}') + f"?v={int(time.time())}"
+        # Cropped photo and cover arrive as multipart files, spooled to disk
+        # by Werkzeug; images.store() reads them in chunks
+        for upload, kind, attr in ((form.photo.data, "avatar", "photo_url"), (form.cover.data, "cover", "cover_url")):
+            # A page cached from before file uploads still posts data URLs
+            if not (isinstance(upload, FileStorage) and upload.filename):
+                continue
+            try:
+                stored = images.store(upload.stream, kind)
+            except images.ImageError:
+                # Keep the submitted form; nothing is saved
+                db.session.rollback()
+                flash('That image could not be read. Please upload a JPEG, PNG or WebP file.', 'error')
+                return render_template('users/edit_profile.html', form=form)
+            setattr(profile, attr, url_for('static', filename=stored))
 
         db.session.commit()
         flash('Your profile has been updated successfully.', 'success')
@@ -77,6 +99,40 @@ def edit_profile():
     return render_template('users/edit_profile.html', form=form)
 
 
+@bp.route("/<int:user_id>/followers")
+def followers_list(user_id):
+    user = User.query.get_or_404(user_id)
+    query = User.query.join(followers, followers.c.follower_id == User.id) \
+        .filter(followers.c.followed_id == user.id)
+    return _follow_list(user, query, followers.c.follower_id, "followers")
+
+
+@bp.route("/<int:user_id>/following")
+def following_list(user_id):
+    user = User.query.get_or_404(user_id)
+    query = User.query.join(followers, followers.c.followed_id == User.id) \
+        .filter(followers.c.follower_id == user.id)
+    return _follow_list(user, query, followers.c.followed_id, "following")
+
+
+def _follow_list(user, query, id_column, kind):
+    """Keyset page of users, with the viewer's follow state for all of them
+    looked up in one batch per direction.
+
+    Pages are keyed on the followers column (equal to User.id) so they are
+    range scans of the followers indexes rather than a sort.
+    """
+    page = keyset_paginate(query.options(selectinload(User.profile)), (id_column,),
+                           request.args.get("cursor"), per_page=20, row_key=lambda u: (u.id,))
+    ids = [u.id for u in page.items]
+    you_follow = follows_you = set()
+    if current_user.is_authenticated and ids:
+        you_follow = current_user.is_following_many(ids)
+        follows_you = current_user.followed_by_many(ids)
+    return render_template("users/follow_list.html", user=user, users=page, kind=kind,
+                           you_follow=you_follow, follows_you=follows_you)
+
+
 @bp.route("/<int:user_id>/follow", methods=["POST"])
 @login_required
 def follow(user_id):
@@ -84,7 +140,10 @@ def follow(user_id):
     if user == current_user:
         flash("You cannot follow yourself.", "error")
     else:
-        current_user.follow(user)
+        if not current_user.is_following(user):
+            feed.backfill(current_user, user)
+            current_user.follow(user)
+            suggestions.on_follow_change(current_user, user)
         db.session.commit()
         flash(f"You are now following {user.profile.first_name or user.email}", "success")
     return redirect(url_for("users.profile", user_id=user_id))
@@ -94,7 +153,10 @@ def follow(user_id):
 @login_required
 def unfollow(user_id):
     user = User.query.get_or_404(user_id)
-    current_user.unfollow(user)
+    if current_user.is_following(user):
+        current_user.unfollow(user)
+        feed.forget_author(current_user, user)
+        suggestions.on_follow_change(current_user, user)
     db.session.commit()
     flash(f"You unfollowed {user.profile.first_name or user.email}", "success")
     return redirect(url_for("users.profile", user_id=user_id))
\ No newline at end of file
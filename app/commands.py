@@ -0,0 +1,186 @@
+import subprocess
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from .extensions import db
+from .models import (User, Post, PostLike, PostComment, Blog, BlogLike, BlogComment, Tag, Event,
+                     EventRegistration, followers, blog_tag)
+from . import search, related, suggestions, reminders, outbox, images, pdfs, pdf_index, assets
+
+counters_cli = AppGroup("counters", help="Maintain denormalized counter columns.")
+search_cli = AppGroup("search", help="Maintain the full-text search indexes.")
+related_cli = AppGroup("related", help="Maintain the related-blogs similarity index.")
+suggestions_cli = AppGroup("suggestions", help="Maintain the people-you-may-know suggestions.")
+events_cli = AppGroup("events", help="Event registration and reminder tools.")
+outbox_cli = AppGroup("outbox", help="Deliver queued transactional email.")
+images_cli = AppGroup("images", help="Maintain resized image renditions.")
+library_cli = AppGroup("library", help="Maintain library PDF storage.")
+assets_cli = AppGroup("assets", help="Build fingerprinted static assets.")
+
+
+def _counter_sources():
+    """(model, column, correlated COUNT subquery) for every denormalized counter."""
+    def count_of(where):
+        return db.select(db.func.count()).where(where).scalar_subquery()
+
+    post_reply, blog_reply = db.aliased(PostComment), db.aliased(BlogComment)
+
+    return [
+        (Post, "like_count", count_of(PostLike.post_id == Post.id)),
+        (Post, "comment_count", count_of(PostComment.post_id == Post.id)),
+        (Blog, "like_count", count_of(BlogLike.blog_id == Blog.id)),
+        (Blog, "comment_count", count_of(BlogComment.blog_id == Blog.id)),
+        (PostComment, "reply_count", count_of(post_reply.parent_id == PostComment.id)),
+        (BlogComment, "reply_count", count_of(blog_reply.parent_id == BlogComment.id)),
+        (User, "follower_count", count_of(followers.c.followed_id == User.id)),
+        (User, "following_count", count_of(followers.c.follower_id == User.id)),
+        (Tag, "blog_count", count_of(blog_tag.c.tag_id == Tag.id)),
+        (Event, "seats_taken", count_of(EventRegistration.event_id == Event.id)),
+    ]
+
+
+@counters_cli.command("repair")
+@click.option("--dry-run", is_flag=True, help="Only report drifted rows.")
+def repair_counters(dry_run):
+    """Recompute like/comment/reply/follower/tag/seat counters and fix rows that drifted."""
+    for model, name, actual in _counter_sources():
+        column = getattr(model, name)
+        if dry_run:
+            drifted = db.session.execute(
+                db.select(db.func.count()).select_from(model).where(column != actual)
+            ).scalar()
+        else:
+            drifted = db.session.execute(
+                db.update(model).where(column != actual).values({name: actual})
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        click.echo(f"{model.__tablename__}.{name}: {drifted} drifted")
+    if not dry_run:
+        db.session.commit()
+
+
+@search_cli.command("rebuild-blogs")
+def rebuild_blog_search():
+    """Re-index every blog into the blog_fts table."""
+    if not search.fts_enabled():
+        raise click.ClickException("Full-text search needs SQLite FTS5.")
+    count = search.rebuild_blog_index()
+    click.echo(f"Indexed {count} blogs")
+
+
+@related_cli.command("rebuild")
+def rebuild_related():
+    """Recompute the top-k similar blogs for every blog (TF-IDF cosine)."""
+    count = related.rebuild_all()
+    click.echo(f"Scored {count} blogs")
+
+
+@suggestions_cli.command("rebuild")
+def rebuild_suggestions():
+    """Recompute the top-N friends-of-friends suggestions for every user."""
+    count = suggestions.rebuild_all()
+    click.echo(f"Suggested accounts for {count} users")
+
+
+@images_cli.command("backfill")
+def backfill_images():
+    """Resize avatars and covers uploaded before renditions existed."""
+    count = images.backfill(log=click.echo)
+    click.echo(f"Converted {count} images")
+
+
+@library_cli.command("migrate-blobs")
+def migrate_pdf_blobs():
+    """Move PDFs stored under their upload names into content-addressed blobs."""
+    count = pdfs.migrate_legacy(log=click.echo)
+    click.echo(f"Migrated {count} PDFs")
+
+
+@library_cli.command("index")
+@click.option("--once", is_flag=True, help="Exit when nothing is pending instead of polling.")
+@click.option("--poll-interval", type=float, default=None, help="Seconds between polls when idle.")
+def index_pdfs(once, poll_interval):
+    """Extract page text from newly uploaded PDFs into the search index.
+
+    Run it as its own process; uploads only queue their blob.
+    """
+    if not search.fts_enabled():
+        raise click.ClickException("Full-text search needs SQLite FTS5.")
+    count = pdf_index.run_indexer(poll_interval, once, log=click.echo)
+    click.echo(f"Indexed {count} PDFs")
+
+
+@library_cli.command("reindex")
+def reindex_pdfs():
+    """Queue every stored PDF for text extraction again."""
+    click.echo(f"Queued {pdf_index.reindex_all()} PDFs")
+
+
+@assets_cli.command("build")
+@click.option("--skip-css", is_flag=True, help="Don't recompile Tailwind; only fingerprint the files.")
+def build_assets(skip_css):
+    """Compile the Tailwind CSS and rewrite static/dist and its manifest.
+
+    Run it after changing templates, scripts or vendored files. The CSS
+    needs the Tailwind standalone CLI (`pip install tailwindcss-bin`).
+    """
+    if not skip_css:
+        try:
+            assets.compile_css()
+        except FileNotFoundError as exc:
+            raise click.ClickException(f"{exc} (or pass --skip-css)")
+        except subprocess.CalledProcessError as exc:
+            raise click.ClickException(f"Tailwind failed:\n{exc.stderr.decode(errors='replace')}")
+    entries = assets.build(log=click.echo)
+    click.echo(f"Wrote {len(entries)} assets")
+
+
+@events_cli.command("send-reminders")
+@click.option("--window", default="24h", show_default=True,
+              help="Remind registrants of events starting within this long (e.g. 24h, 90m, 2d).")
+@click.option("--rate", type=float, default=None,
+              help="Messages per second (default EVENT_REMINDER_RATE; 0 = unthrottled).")
+@click.option("--chunk-size", type=int, default=None, help="Registrations fetched per query.")
+def send_reminders(window, rate, chunk_size):
+    """Email reminders for upcoming events over one SMTP connection.
+
+    Safe to re-run: registrations already reminded are skipped. To try it
+    locally, run `python -m smtpd -n -c DebuggingServer localhost:8025`
+    (or `python -m aiosmtpd -n -l localhost:8025`) and set
+    MAIL_SERVER=localhost MAIL_PORT=8025 MAIL_SUPPRESS_SEND=0.
+    """
+    try:
+        window = reminders.parse_window(window)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--window")
+    sent, refused = reminders.send_event_reminders(window, rate, chunk_size, log=click.echo)
+    click.echo(f"Sent {sent} reminders ({refused} refused)")
+
+
+@outbox_cli.command("work")
+@click.option("--once", is_flag=True, help="Exit when nothing is due instead of polling.")
+@click.option("--concurrency", default=1, show_default=True, help="Sending threads, one SMTP connection each.")
+@click.option("--batch-size", type=int, default=None, help="Messages claimed per query (default OUTBOX_BATCH_SIZE).")
+@click.option("--poll-interval", type=float, default=None, help="Seconds between polls when idle.")
+def work_outbox(once, concurrency, batch_size, poll_interval):
+    """Send queued email, retrying failures with exponential backoff.
+
+    Run it as its own process next to the web workers; several can run at
+    once, each claims its own rows.
+    """
+    sent, retried, failed = outbox.run_worker(
+        current_app._get_current_object(), concurrency, batch_size, poll_interval, once, log=click.echo)
+    click.echo(f"Sent {sent}, {retried} to retry, {failed} failed")
+
+
+@outbox_cli.command("stats")
+def outbox_stats():
+    """Count outbox messages by status."""
+    for status, count in sorted(outbox.stats().items()):
+        click.echo(f"{status}: {count}")
+
+
+@outbox_cli.command("retry-failed")
+def retry_failed_outbox():
+    """Queue messages that ran out of attempts again."""
+    click.echo(f"Requeued {outbox.retry_failed()} messages")
@@ -0,0 +1,171 @@
+from sqlalchemy.orm import joinedload
+from .extensions import db
+from .models import User
+from .pagination import keyset_paginate, encode_cursor, decode_cursor
+
+# Each path segment is the comment id zero-padded to PATH_WIDTH digits plus
+# "/", so sorting on path walks a thread depth-first, oldest reply first.
+PATH_WIDTH = 8
+# path is a String(255): 255 // (PATH_WIDTH + 1) levels fit
+MAX_DEPTH = 255 // (PATH_WIDTH + 1) - 1
+
+DEFAULT_LIMIT, MAX_LIMIT = 20, 100
+# Reply levels returned below each listed comment before "load more"
+DEFAULT_REPLY_DEPTH = 3
+# Replies nested under any one comment; the rest are behind "load more"
+REPLIES_PER_PARENT = 5
+# Replies nested in one response, whatever limit and depth ask for
+MAX_NESTED_REPLIES = 300
+SINCE_LIMIT = 100
+
+
+def path_segment(comment_id):
+    return f"{comment_id:0{PATH_WIDTH}d}/"
+
+
+def find_parent(model, parent_id, **owner):
+    """The comment ``parent_id`` if it belongs to the same post/blog, else None.
+
+    Replies below MAX_DEPTH are attached to the parent's parent instead.
+    """
+    if not parent_id:
+        return None
+    parent = model.query.filter_by(id=parent_id, **owner).first()
+    if parent is not None and parent.depth >= MAX_DEPTH:
+        parent = parent.parent
+    return parent
+
+
+def set_path(comment, parent=None):
+    """Fill in path/depth for a new comment; it must be flushed (have an id)."""
+    comment.path = (parent.path if parent else "") + path_segment(comment.id)
+    comment.depth = parent.depth + 1 if parent else 0
+
+
+def author_name(user):
+    return (user.profile and user.profile.first_name) or user.email
+
+
+def serialize(comment):
+    return {
+        "id": comment.id,
+        "parent_id": comment.parent_id,
+        "depth": comment.depth,
+        "body": comment.body,
+        "user": author_name(comment.user),
+        "created_at": comment.created_at.strftime("%Y-%m-%d %H:%M"),
+        "reply_count": comment.reply_count,
+        "replies": [],
+        # Set when replies exist but were cut off; pass back as ?replies=,
+        # with ?cursor=replies_cursor to skip the ones already nested here
+        "more_replies": None,
+        "replies_cursor": None,
+    }
+
+
+def _int_arg(args, name, default, upper):
+    try:
+        value = int(args.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return min(max(value, 0), upper)
+
+
+def _with_authors(query, model):
+    return query.options(joinedload(model.user).joinedload(User.profile))
+
+
+def _latest(model, owner):
+    latest = db.session.query(db.func.max(model.id)).filter_by(**owner).scalar()
+    return encode_cursor("since", latest or 0)
+
+
+def _tree(model, owner, items, reply_depth):
+    """Nest up to ``reply_depth`` levels of replies under ``items``, at most
+    REPLIES_PER_PARENT under each comment and MAX_NESTED_REPLIES in all.
+
+    One query per level: the first replies of each comment on the level
+    above, numbered per parent with ROW_NUMBER() over the
+    (owner, parent_id, created_at, id) index. Comments whose replies were
+    cut off get a ``more_replies`` token.
+    """
+    nodes = {c.id: serialize(c) for c in items}
+    keys = {}  # nested reply id -> its (created_at, id) sort key
+    parents = [c.id for c in items if c.reply_count]
+    for _ in range(reply_depth):
+        parents = parents[:(MAX_NESTED_REPLIES - len(keys)) // REPLIES_PER_PARENT]
+        if not parents:
+            break
+        position = db.func.row_number().over(
+            partition_by=model.parent_id, order_by=(model.created_at, model.id)
+        ).label("position")
+        first = (
+            db.select(model.id, position)
+            .where(*(getattr(model, k) == v for k, v in owner.items()))
+            .where(model.parent_id.in_(parents))
+            .subquery()
+        )
+        rows = (
+            _with_authors(model.query.join(first, model.id == first.c.id), model)
+            .filter(first.c.position <= REPLIES_PER_PARENT)
+            .order_by(model.path)
+            .all()
+        )
+        for c in rows:
+            nodes[c.id] = serialize(c)
+            keys[c.id] = (c.created_at, c.id)
+            nodes[c.parent_id]["replies"].append(nodes[c.id])
+        parents = [c.id for c in rows if c.reply_count]
+
+    for node in nodes.values():
+        if node["reply_count"] > len(node["replies"]):
+            node["more_replies"] = encode_cursor("replies", node["id"])
+            if node["replies"]:
+                last = max(keys[r["id"]] for r in node["replies"])
+                node["replies_cursor"] = encode_cursor("next", *last)
+    return [nodes[c.id] for c in items]
+
+
+def load_comments(model, args, **owner):
+    """JSON payload for a comment endpoint, driven by the query string.
+
+    - ``limit``/``cursor``: keyset page of top-level comments, newest first.
+    - ``replies=<token>``: page through the replies of one comment instead
+      (oldest first); tokens come from a comment's ``more_replies``.
+    - ``depth``: reply levels nested under each listed comment, the first
+      REPLIES_PER_PARENT replies per comment; comments with replies left
+      out carry a ``more_replies`` token.
+    - ``since=<token>``: comments posted after a previous response's
+      ``latest`` token, as a flat list in posting order.
+    """
+    limit = _int_arg(args, "limit", DEFAULT_LIMIT, MAX_LIMIT) or DEFAULT_LIMIT
+    reply_depth = _int_arg(args, "depth", DEFAULT_REPLY_DEPTH, MAX_DEPTH)
+
+    since = decode_cursor(args.get("since"))
+    if since and len(since) == 2 and since[0] == "since" and isinstance(since[1], int):
+        rows = (
+            _with_authors(model.query.filter_by(**owner), model)
+            .filter(model.id > since[1])
+            .order_by(model.id)
+            .limit(SINCE_LIMIT)
+            .all()
+        )
+        latest = encode_cursor("since", rows[-1].id) if rows else args.get("since")
+        return {"comments": [serialize(c) for c in rows], "latest": latest,
+                "has_more": len(rows) == SINCE_LIMIT}
+
+    parent = None
+    token = decode_cursor(args.get("replies"))
+    if token and len(token) == 2 and token[0] == "replies" and isinstance(token[1], int):
+        parent = model.query.filter_by(id=token[1], **owner).first()
+        if parent is None:
+            return {"comments": [], "next_cursor": None}
+
+    query = _with_authors(model.query.filter_by(parent_id=parent.id if parent else None, **owner), model)
+    page = keyset_paginate(query, (model.created_at, model.id), args.get("cursor"),
+                           per_page=limit, descending=parent is None)
+    payload = {"comments": _tree(model, owner, page.items, reply_depth),
+               "next_cursor": page.next_cursor}
+    if parent is None and not args.get("cursor"):
+        payload["latest"] = _latest(model, owner)
+    return payload
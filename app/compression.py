@@ -0,0 +1,113 @@
+import gzip
+import re
+import brotli
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+# Encodings we produce, preferred first
+ENCODINGS = ("br", "gzip")
+COMPRESSIBLE = ("text/html", "application/json")
+
+# Whitespace inside these is content: <pre>, form fields, scripts, styles
+# and anything styled with Tailwind's whitespace-pre*
+_PROTECTED = re.compile(
+    r"<(pre|textarea|script|style)\b.*?</\1\s*>"
+    r"|<([a-z][a-z0-9]*)\b[^>]*\bwhitespace-pre[^>]*>.*?</\2\s*>",
+    re.S | re.I,
+)
+_LINE_BREAKS = re.compile(r"\s*\n\s*")
+_SPACES = re.compile(r"[ \t]{2,}")
+
+
+def minify_html(html):
+    """Drop indentation and blank lines from rendered HTML. Runs of
+    whitespace only shrink, never vanish, so rendering is unchanged."""
+    out, pos = [], 0
+    for match in _PROTECTED.finditer(html):
+        out.append(_SPACES.sub(" ", _LINE_BREAKS.sub("\n", html[pos:match.start()])))
+        out.append(match.group())
+        pos = match.end()
+    out.append(_SPACES.sub(" ", _LINE_BREAKS.sub("\n", html[pos:])))
+    return "".join(out)
+
+
+def compress(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, quality=level["br"])
+    return gzip.compress(data, level["gzip"], mtime=0)
+
+
+class Compressor:
+    """WSGI middleware compressing HTML and JSON responses.
+
+    The encoding is negotiated from Accept-Encoding (brotli preferred), and
+    bodies under COMPRESS_MIN_SIZE go out as they are. With HTML_MINIFY,
+    HTML is stripped of indentation first. Only fully buffered responses
+    (those with a Content-Length) are touched; streamed bodies, ranges,
+    HEAD requests and anything already encoded, such as the precompressed
+    static files (see assets.send_static), pass straight through.
+    """
+
+    def __init__(self, wsgi_app, config):
+        self.wsgi_app = wsgi_app
+        self.min_size = config["COMPRESS_MIN_SIZE"]
+        self.level = {"gzip": config["COMPRESS_LEVEL"], "br": config["COMPRESS_BR_QUALITY"]}
+        self.minify = config["HTML_MINIFY"]
+
+    def __call__(self, environ, start_response):
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, Headers(headers), exc_info]
+            return lambda data: None  # write() is never used by Flask
+
+        body = self.wsgi_app(environ, capture)
+        status, headers, exc_info = captured
+        mimetype = headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        if mimetype not in COMPRESSIBLE:
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        _add_vary(headers)
+        if (environ["REQUEST_METHOD"] == "HEAD" or status[:3] in ("204", "206", "304")
+                or "Content-Encoding" in headers or "Content-Length" not in headers):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        try:
+            data = b"".join(body)
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+
+        if self.minify and mimetype == "text/html":
+            charset = _charset(headers)
+            data = minify_html(data.decode(charset)).encode(charset)
+        encoding = _negotiate(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding and len(data) >= self.min_size:
+            data = compress(data, encoding, self.level)
+            headers["Content-Encoding"] = encoding
+            # The bytes differ per encoding, so a strong validator can't be shared
+            etag = headers.get("ETag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+        headers["Content-Length"] = str(len(data))
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return [data]
+
+
+def _negotiate(accept_encoding):
+    accepted = parse_accept_header(accept_encoding)
+    best = max(ENCODINGS, key=lambda e: accepted[e], default=None)
+    return best if best and accepted[best] > 0 else None
+
+
+def _charset(headers):
+    match = re.search(r"charset=([\w-]+)", headers.get("Content-Type", ""), re.I)
+    return match.group(1) if match else "utf-8"
+
+
+def _add_vary(headers):
+    vary = [v.strip() for v in headers.get("Vary", "").split(",") if v.strip()]
+    if "accept-encoding" not in (v.lower() for v in vary):
+        headers["Vary"] = ", ".join(vary + ["Accept-Encoding"])
@@ -10,5 +10,35 @@ class Config:
     MAIL_USERNAME = os.getenv("MAIL_USERNAME")
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
     SECURITY_EMAIL_SENDER = os.getenv("SECURITY_EMAIL_SENDER", "noreply@lingpen.local")
+    MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", SECURITY_EMAIL_SENDER)
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "static", "uploads")
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(32 * 1024 * 1024)))  # bytes per request, 413 above
+    PDF_CACHE_MAX_AGE = int(os.getenv("PDF_CACHE_MAX_AGE", "3600"))  # seconds, private
+    # Internal nginx location aliased to UPLOAD_FOLDER, e.g. /_pdf_blobs/; empty = Flask streams the file
+    PDF_ACCEL_REDIRECT = os.getenv("PDF_ACCEL_REDIRECT", "")
+    USE_X_SENDFILE = bool(int(os.getenv("USE_X_SENDFILE", "0")))  # Apache mod_xsendfile / lighttpd
+    PDF_INDEX_POLL_INTERVAL = float(os.getenv("PDF_INDEX_POLL_INTERVAL", "10"))  # seconds
+    PDF_INDEX_LEASE = int(os.getenv("PDF_INDEX_LEASE", "600"))  # seconds without a heartbeat before a claim is retaken
+    PDF_INDEX_BATCH_PAGES = int(os.getenv("PDF_INDEX_BATCH_PAGES", "20"))  # pages written per transaction
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # bytes; smaller HTML/JSON goes out as is
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))  # gzip, 1-9
+    COMPRESS_BR_QUALITY = int(os.getenv("COMPRESS_BR_QUALITY", "5"))  # brotli, 0-11
+    HTML_MINIFY = bool(int(os.getenv("HTML_MINIFY", "0")))  # strip indentation from rendered HTML
+    TAILWIND_BIN = os.getenv("TAILWIND_BIN", "tailwindcss")  # standalone CLI used by `flask assets build`
     MAIL_SUPPRESS_SEND = bool(int(os.getenv("MAIL_SUPPRESS_SEND", "1")))
+    VIEW_FLUSH_INTERVAL = int(os.getenv("VIEW_FLUSH_INTERVAL", "30"))  # seconds
+    VIEW_FLUSH_THRESHOLD = int(os.getenv("VIEW_FLUSH_THRESHOLD", "100"))  # pending views
+    RELEASE = os.getenv("RELEASE", "")  # deployed version (e.g. git sha); part of page ETags
+    HOME_CACHE_TTL = int(os.getenv("HOME_CACHE_TTL", "30"))  # seconds
+    RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", "5"))
+    FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv("FEED_FANOUT_MAX_FOLLOWERS", "5000"))
+    EVENT_REMINDER_RATE = float(os.getenv("EVENT_REMINDER_RATE", "5"))  # messages per second, 0 = unthrottled
+    EVENT_REMINDER_CHUNK = int(os.getenv("EVENT_REMINDER_CHUNK", "200"))  # registrations per query
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))  # messages claimed per query
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # seconds
+    OUTBOX_LEASE = int(os.getenv("OUTBOX_LEASE", "300"))  # seconds before a dead worker's claim is retaken
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    OUTBOX_BACKOFF = int(os.getenv("OUTBOX_BACKOFF", "30"))  # seconds, doubled per attempt
+    OUTBOX_BACKOFF_MAX = int(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))
+    SUGGESTIONS_TOP_N = int(os.getenv("SUGGESTIONS_TOP_N", "20"))
+    SUGGESTIONS_MAX_FOLLOWING = int(os.getenv("SUGGESTIONS_MAX_FOLLOWING", "2000"))  # busier accounts are not used as a hop
@@ -1,7 +1,13 @@
+import hashlib
+import time
 from functools import wraps
-from flask import abort
+from flask import abort, current_app, make_response, request, session
 from flask_login import current_user
 
+# Stands in for RELEASE when it is unset: pages cached before a restart
+# (usually a deploy) are re-rendered once
+_STARTED = repr(time.time())
+
 def admin_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -9,3 +15,44 @@ def admin_required(f):
             abort(403)
         return f(*args, **kwargs)
     return wrapper
+
+
+def conditional(version):
+    """Answer GET/HEAD with 304 Not Modified before the view runs when the
+    client's weak ETag is still current.
+
+    ``version(**view_args)`` returns a tuple that changes whenever the page
+    would, read with one cheap query, or None to hand straight over to the
+    view (which then 404s). The ETag also covers the viewer, the query
+    string and the release. Pages with flashed messages waiting are always
+    rendered, so the message is not left behind for a later page.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return f(*args, **kwargs)
+            parts = version(**kwargs)
+            if parts is None or session.get("_flashes"):
+                return f(*args, **kwargs)
+
+            etag = _etag(parts)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Per viewer, and checked on every use
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def _etag(parts):
+    viewer = current_user.get_id() if current_user.is_authenticated else None
+    key = (current_app.config["RELEASE"] or _STARTED, viewer, request.query_string, parts)
+    return hashlib.sha1(repr(key).encode()).hexdigest()
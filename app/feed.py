@@ -0,0 +1,87 @@
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from .extensions import db
+from .models import User, Post, TimelineEntry, followers
+from .pagination import encode_cursor, decode_cursor
+
+BACKFILL_POSTS = 20
+
+
+def _fanout_limit():
+    return current_app.config["FEED_FANOUT_MAX_FOLLOWERS"]
+
+
+def _insert_entries(select):
+    db.session.execute(
+        db.insert(TimelineEntry).from_select(["user_id", "post_id", "author_id", "created_at"], select)
+    )
+
+
+def fan_out_post(post, author):
+    """Write a new post into its author's timeline and, unless the author is
+    too popular for fan-out-on-write, into every follower's timeline too."""
+    db.session.add(TimelineEntry(user_id=author.id, post_id=post.id,
+                                 author_id=author.id, created_at=post.created_at))
+    if author.follower_count > _fanout_limit():
+        return  # merged in at read time, see load_feed()
+    _insert_entries(
+        db.select(followers.c.follower_id, db.literal(post.id), db.literal(author.id),
+                  db.literal(post.created_at, db.DateTime))
+        .where(followers.c.followed_id == author.id)
+    )
+
+
+def backfill(follower, followed):
+    """Seed a fresh follow with the followed user's most recent posts."""
+    if followed.follower_count > _fanout_limit():
+        return
+    _insert_entries(
+        db.select(db.literal(follower.id), Post.id, Post.user_id, Post.created_at)
+        .where(Post.user_id == followed.id)
+        .order_by(Post.created_at.desc())
+        .limit(BACKFILL_POSTS)
+    )
+
+
+def forget_author(follower, followed):
+    """Drop an unfollowed user's posts from the follower's timeline."""
+    TimelineEntry.query.filter_by(user_id=follower.id, author_id=followed.id) \
+        .delete(synchronize_session=False)
+
+
+def forget_post(post):
+    TimelineEntry.query.filter_by(post_id=post.id).delete(synchronize_session=False)
+
+
+def load_feed(user, cursor=None, per_page=20):
+    """Return ``(posts, next_cursor)`` for one page of the user's feed.
+
+    Fanned-out timeline rows and posts of followed high-follower accounts
+    (fan-out-on-read) are each read with a keyset query capped at the page
+    size and merged, so the cost does not grow with the follow graph.
+    """
+    after = decode_cursor(cursor)
+
+    fanned = db.select(TimelineEntry.created_at, TimelineEntry.post_id) \
+        .where(TimelineEntry.user_id == user.id)
+    celebrities = db.select(followers.c.followed_id) \
+        .join(User, User.id == followers.c.followed_id) \
+        .where(followers.c.follower_id == user.id, User.follower_count > _fanout_limit())
+    pulled = db.select(Post.created_at, Post.id).where(Post.user_id.in_(celebrities))
+
+    keys = set()
+    for select, created_col, id_col in ((fanned, TimelineEntry.created_at, TimelineEntry.post_id),
+                                         (pulled, Post.created_at, Post.id)):
+        if after:
+            select = select.where(db.tuple_(created_col, id_col) < after)
+        select = select.order_by(created_col.desc(), id_col.desc()).limit(per_page + 1)
+        keys.update(tuple(row) for row in db.session.execute(select))
+
+    keys = sorted(keys, reverse=True)
+    next_cursor = encode_cursor(*keys[per_page - 1]) if len(keys) > per_page else None
+    keys = keys[:per_page]
+
+    by_id = {p.id: p for p in Post.query.options(joinedload(Post.user).selectinload(User.profile))
+             .filter(Post.id.in_([post_id for _, post_id in keys]))}
+    posts = [by_id[post_id] for _, post_id in keys if post_id in by_id]
+    return posts, next_cursor
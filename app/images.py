@@ -0,0 +1,196 @@
+import hashlib
+import os
+import re
+import threading
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .extensions import db
+from .models import Profile, Blog
+
+# Widths generated per kind. Avatars are square crops; covers keep their
+# aspect ratio and are never upscaled.
+RENDITIONS = {"avatar": (48, 96, 256), "cover": (640, 1280)}
+FORMATS = (("webp", "WEBP", {"quality": 80, "method": 4}),
+           ("jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}))
+
+# Renditions live in static/renditions/<kind>/<hash>-<width>.<ext>; the hash
+# is of the uploaded bytes, so re-uploading an image stores nothing new.
+RENDITION_DIR = "renditions"
+_HASH_LEN = 20
+_NAME_RE = re.compile(rf"{RENDITION_DIR}/(avatar|cover)/([0-9a-f]{{{_HASH_LEN}}})-\d+\.jpg")
+
+# Refuse to decode anything bigger than this (decompression bombs)
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+CHUNK_SIZE = 64 * 1024
+
+# Accepted upload types: Pillow format and the (offset, bytes) it starts with
+_MAGIC = (
+    ("JPEG", ((0, b"\xff\xd8\xff"),)),
+    ("PNG", ((0, b"\x89PNG\r\n\x1a\n"),)),
+    ("GIF", ((0, b"GIF8"),)),
+    ("WEBP", ((0, b"RIFF"), (8, b"WEBP"))),
+)
+
+
+class ImageError(ValueError):
+    """The upload is not an image we accept or Pillow can read."""
+
+
+def _path(kind, digest, width, ext):
+    return f"{RENDITION_DIR}/{kind}/{digest}-{width}.{ext}"
+
+
+def _resize(image, kind, width):
+    if kind == "avatar":
+        return ImageOps.fit(image, (width, width), Image.LANCZOS)
+    if image.width <= width:
+        return image
+    return image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+
+
+def _flatten(image):
+    """RGB copy for JPEG, with transparency composited onto white."""
+    if image.mode == "RGB":
+        return image
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+    return background
+
+
+def _write(path, image, fmt, options):
+    full = os.path.join(current_app.static_folder, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    tmp = f"{full}.{os.getpid()}-{threading.get_ident()}.tmp"
+    image.save(tmp, fmt, **options)
+    os.replace(tmp, full)
+
+
+def sniff(stream):
+    """Pillow format name from the first bytes of ``stream``, or None if it
+    is not one of the accepted types. The stream is left at the start."""
+    head = stream.read(16)
+    stream.seek(0)
+    for fmt, signature in _MAGIC:
+        if all(head[offset:offset + len(magic)] == magic for offset, magic in signature):
+            return fmt
+    return None
+
+
+def _digest(stream):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()[:_HASH_LEN]
+
+
+def store(stream, kind):
+    """Decode the image in the binary file ``stream`` once and write every
+    rendition of ``kind`` in WebP and JPEG. Returns the static path of the
+    largest JPEG, the value kept in the database; srcset() derives the
+    other renditions from it.
+
+    The upload is hashed in CHUNK_SIZE pieces and only ever read through
+    ``stream``, so it can stay in Werkzeug's spooled temp file. Raises
+    ImageError if it is not a JPEG, PNG, GIF or WebP image.
+    """
+    source_format = sniff(stream)
+    if source_format is None:
+        raise ImageError("not a JPEG, PNG, GIF or WebP image")
+    digest = _digest(stream)
+    widths = RENDITIONS[kind]
+    fallback = _path(kind, digest, widths[-1], "jpg")
+    if os.path.exists(os.path.join(current_app.static_folder, fallback)):
+        return fallback  # same image uploaded before
+
+    try:
+        with Image.open(stream, formats=[source_format]) as source:
+            # JPEGs decode straight at the smallest scale that still covers
+            # the largest rendition, instead of at full resolution
+            source.draft("RGB", (widths[-1], widths[-1]))
+            image = ImageOps.exif_transpose(source)
+            image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+        raise ImageError(str(exc)) from exc
+
+    # Largest first: the fallback JPEG is written last, so its presence
+    # above means the whole set is complete
+    for width in reversed(widths):
+        resized = _resize(image, kind, width)
+        for ext, fmt, options in FORMATS:
+            _write(_path(kind, digest, width, ext), resized if ext == "webp" else _flatten(resized), fmt, options)
+    return fallback
+
+
+def _static_path(src):
+    """Strip a stored value (static path or /static/... URL) to its static path."""
+    src = (src or "").split("?", 1)[0]
+    prefix = current_app.static_url_path.rstrip("/") + "/"
+    return src[len(prefix):] if src.startswith(prefix) else src.lstrip("/")
+
+
+def srcset(src, ext="jpg"):
+    """``srcset`` attribute value for a stored image, or "" for images saved
+    before renditions existed."""
+    match = _NAME_RE.fullmatch(_static_path(src))
+    if not match:
+        return ""
+    kind, digest = match.groups()
+    return ", ".join(f"{url_for('static', filename=_path(kind, digest, w, ext))} {w}w"
+                     for w in RENDITIONS[kind])
+
+
+def backfill(log=None):
+    """Convert images stored before renditions existed (profile photos and
+    covers, blog covers) and point their rows at the renditions. Missing or
+    unreadable files are reported and left alone. Returns rows converted."""
+    converted = 0
+    # Profiles store a URL, blogs a static path (as their upload routes do)
+    as_url = f"{current_app.static_url_path}/{{}}".format
+    targets = [(Profile, "photo_url", "avatar", as_url),
+               (Profile, "cover_url", "cover", as_url),
+               (Blog, "cover_image", "cover", str)]
+    for model, attr, kind, to_value in targets:
+        column = getattr(model, attr)
+        for row in model.query.filter(column.isnot(None), column != "").yield_per(200):
+            src = _static_path(getattr(row, attr))
+            if _NAME_RE.fullmatch(src):
+                continue
+            try:
+                with open(os.path.join(current_app.static_folder, src), "rb") as f:
+                    stored = store(f, kind)
+            except (OSError, ImageError) as exc:
+                if log:
+                    log(f"skipped {model.__tablename__} {row.id}: {exc}")
+                continue
+            setattr(row, attr, to_value(stored))
+            converted += 1
+    db.session.commit()
+    return converted
+
+
+def image_url(src, default=None):
+    """URL for a stored image value; legacy rows hold a full URL already."""
+    if not src:
+        return url_for("static", filename=default) if default else ""
+    if src.startswith(("/", "http://", "https://")):
+        return src
+    return url_for("static", filename=src)
+
+
+def picture(src, sizes, alt="", default=None, **attrs):
+    """``<picture>`` for a stored image: WebP and JPEG srcsets so the browser
+    fetches the smallest rendition that fills ``sizes``. Extra keyword
+    arguments become <img> attributes (``class_`` for class)."""
+    img_attrs = {"src": image_url(src, default), "alt": alt, "loading": "lazy", "decoding": "async"}
+    img_attrs.update({k.rstrip("_").replace("_", "-"): v for k, v in attrs.items()})
+    jpg, webp = srcset(src), srcset(src, "webp")
+    if jpg:
+        img_attrs.update(srcset=jpg, sizes=sizes)
+    img = "<img " + " ".join(f'{k}="{escape(v)}"' for k, v in img_attrs.items() if v is not None) + ">"
+    if not webp:
+        return Markup(img)
+    return Markup(f'<picture><source type="image/webp" srcset="{escape(webp)}" sizes="{escape(sizes)}">'
+                  f"{img}</picture>")
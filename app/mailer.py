@@ -1,7 +1,9 @@
+from smtplib import SMTPServerDisconnected
 from itsdangerous import URLSafeTimedSerializer
 from flask import current_app, url_for, render_template
 from flask_mail import Message
-from .extensions import mail
+from .extensions import db, mail
+from .models import EmailOutbox
 
 def _serializer():
     return URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
@@ -14,43 +16,73 @@ def confirm_token(token, salt, max_age=86400):
     s = _serializer()
     return s.loads(token, salt=salt, max_age=max_age)
 
+# ----------------------
+# DELIVERY
+# ----------------------
+
+def queue(msg):
+    """Add ``msg`` to the email outbox, one row per recipient.
+
+    Nothing is sent here: the rows commit (or roll back) with the caller's
+    transaction and `flask outbox work` delivers them, so requests never
+    wait on the SMTP server.
+    """
+    for recipient in msg.recipients:
+        db.session.add(EmailOutbox(recipient=recipient, sender=msg.sender, subject=msg.subject,
+                                   body=msg.body, html=msg.html))
+
+def send_over(conn, msg):
+    """Send on an open ``mail.connect()`` connection."""
+    try:
+        conn.send(msg)
+    except SMTPServerDisconnected:
+        # Servers drop long-lived sessions; reconnect once and retry
+        conn.host = conn.configure_host()
+        conn.send(msg)
+
 # ----------------------
 # AUTH EMAILS
 # ----------------------
 
 def send_verification(email):
+    """Queue the verification email; delivered once the caller commits"""
     token = generate_token(email, "email-confirm")
     link = url_for("auth.verify_email", token=token, _external=True)
     msg = Message("Verify your LingPen email", recipients=[email])
     msg.body = render_template("emails/verify.txt", link=link)
     msg.html = render_template("emails/verify.html", link=link)
-    mail.send(msg)
+    queue(msg)
 
 def send_reset(email):
+    """Queue the password reset email; delivered once the caller commits"""
     token = generate_token(email, "password-reset")
     link = url_for("auth.reset_password", token=token, _external=True)
     msg = Message("Reset your LingPen password", recipients=[email])
     msg.body = render_template("emails/reset.txt", link=link)
     msg.html = render_template("emails/reset.html", link=link)
-    mail.send(msg)
+    queue(msg)
 
 # ----------------------
 # EVENT & COURSE EMAILS
 # ----------------------
 
 def send_event_registration(user, event):
-    """Send confirmation email after user registers for an event"""
+    """Queue the confirmation email after user registers for an event"""
     msg = Message(f"Registered for {event.title}", recipients=[user.email])
     msg.body = render_template("emails/event_registration.txt", user=user, event=event)
     msg.html = render_template("emails/event_registration.html", user=user, event=event)
-    mail.send(msg)
+    queue(msg)
 
-def send_event_reminder(user, event):
-    """Send reminder before the event starts"""
+def event_reminder_message(user, event):
+    """Reminder before the event starts (sent in bulk by app/reminders.py)"""
     msg = Message(f"Reminder: {event.title}", recipients=[user.email])
     msg.body = render_template("emails/event_reminder.txt", user=user, event=event)
     msg.html = render_template("emails/event_reminder.html", user=user, event=event)
-    mail.send(msg)
+    return msg
+
+def send_event_reminder(user, event):
+    """Send reminder before the event starts"""
+    mail.send(event_reminder_message(user, event))
 
 def send_course_enrollment(user, course):
     """Send confirmation email after enrolling in a course"""
@@ -1,14 +1,31 @@
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from flask import g, has_request_context
 from flask_login import UserMixin
 from .extensions import db, login_manager
 
 
+def bump_counter(obj, name, delta=1):
+    """Adjust a denormalized counter with an in-database ``col = col + delta``.
+
+    The UPDATE is flushed with the caller's transaction, so concurrent
+    requests never overwrite each other's increments. An ``updated_at``
+    column is pinned to its current value, so a like or comment does not
+    count as an edit (bump counters after, not alongside, real edits).
+    """
+    model = type(obj)
+    setattr(obj, name, getattr(model, name) + delta)
+    if "updated_at" in model.__table__.c:
+        obj.updated_at = model.updated_at
+
+
 # Followers association table
 followers = db.Table(
     "followers",
     db.Column("follower_id", db.Integer, db.ForeignKey("user.id"), primary_key=True),
-    db.Column("followed_id", db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    db.Column("followed_id", db.Integer, db.ForeignKey("user.id"), primary_key=True),
+    # Reverse direction of the primary key: "who follows X"
+    db.Index("ix_followers_followed_follower", "followed_id", "follower_id"),
 )
 
 class User(UserMixin, db.Model):
@@ -21,6 +38,10 @@ class User(UserMixin, db.Model):
     email_verified_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Denormalized counters, kept in step by follow()/unfollow()
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     profile = db.relationship("Profile", uselist=False, back_populates="user")
 
     def set_password(self, pw: str):
@@ -42,17 +63,61 @@ class User(UserMixin, db.Model):
     def follow(self, user):
         if not self.is_following(user):
             self.following.append(user)
+            bump_counter(self, "following_count")
+            bump_counter(user, "follower_count")
+            self._follow_memo("following")[user.id] = True
+            user._follow_memo("followed_by")[self.id] = True
 
     def unfollow(self, user):
         if self.is_following(user):
             self.following.remove(user)
+            bump_counter(self, "following_count", -1)
+            bump_counter(user, "follower_count", -1)
+            self._follow_memo("following")[user.id] = False
+            user._follow_memo("followed_by")[self.id] = False
 
     def is_following(self, user):
-        return self.following.filter(followers.c.followed_id == user.id).count() > 0
+        return user.id in self.is_following_many([user.id])
+
+    def is_following_many(self, user_ids):
+        """The subset of ``user_ids`` this user follows, in one query."""
+        return self._follow_lookup("following", followers.c.follower_id, followers.c.followed_id, user_ids)
+
+    def followed_by_many(self, user_ids):
+        """The subset of ``user_ids`` following this user, in one query."""
+        return self._follow_lookup("followed_by", followers.c.followed_id, followers.c.follower_id, user_ids)
+
+    def _follow_lookup(self, kind, own_column, other_column, user_ids):
+        memo = self._follow_memo(kind)
+        missing = {i for i in user_ids if i not in memo}
+        if missing:
+            found = set(db.session.execute(
+                db.select(other_column).where(own_column == self.id, other_column.in_(missing))
+            ).scalars())
+            memo.update((i, i in found) for i in missing)
+        return {i for i in user_ids if memo[i]}
+
+    def _follow_memo(self, kind):
+        """Per-request {user_id: bool} cache of follow lookups."""
+        if not has_request_context():
+            return {}
+        return g.setdefault("follow_memo", {}).setdefault((kind, self.id), {})
     
     post_comments = db.relationship("PostComment", back_populates="user", lazy="dynamic")
     blog_comments = db.relationship("BlogComment", back_populates="user", lazy="dynamic")
 
+class UserSuggestion(db.Model):
+    """Precomputed "people you may know" for a user (see app/suggestions.py)."""
+    __tablename__ = "user_suggestion"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    suggested_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True, index=True)
+    # How many of the accounts user_id follows also follow suggested_id
+    mutual_count = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index("ix_user_suggestion_user_mutual", "user_id", "mutual_count"),)
+
+
 @login_manager.user_loader
 def load_user(user_id):
     return db.session.get(User, int(user_id))
@@ -83,10 +148,32 @@ class Post(db.Model):
     body = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     user = db.relationship("User", backref=db.backref("posts", lazy="dynamic"))
     likes = db.relationship("PostLike", back_populates="post", cascade='all, delete-orphan', lazy="dynamic")
     comments = db.relationship("PostComment", back_populates="post", cascade='all, delete-orphan', lazy="dynamic")
 
+    __table_args__ = (
+        db.Index("ix_post_user_created", "user_id", "created_at"),
+        db.Index("ix_post_created_id", "created_at", "id"),  # keyset pagination
+    )
+
+class TimelineEntry(db.Model):
+    """A post fanned out to one follower's home feed."""
+    __tablename__ = "timeline"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey("post.id"), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)  # copy of post.created_at
+
+    __table_args__ = (
+        db.Index("ix_timeline_user_created", "user_id", "created_at", "post_id"),
+        db.Index("ix_timeline_user_author", "user_id", "author_id"),
+        db.Index("ix_timeline_post_id", "post_id"),
+    )
+
 class PostLike(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
@@ -100,6 +187,10 @@ class PostComment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False, index=True)
     parent_id = db.Column(db.Integer, db.ForeignKey("post_comment.id"), nullable=True)
+    # Materialized path of zero-padded ids ("00000012/00000045/"), see app/comments.py
+    path = db.Column(db.String(255), nullable=False, default="")
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     body = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -115,6 +206,11 @@ class PostComment(db.Model):
         cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        db.Index("ix_post_comment_post_path", "post_id", "path"),
+        db.Index("ix_post_comment_post_parent_created", "post_id", "parent_id", "created_at", "id"),
+    )
+
 # Blogs, likes, comments, bookmarks
 
 # Association table for bookmarks
@@ -125,6 +221,24 @@ blog_bookmarks = db.Table(
     db.Column("created_at", db.DateTime, default=datetime.utcnow)
 )
 
+# Association table for normalized blog tags
+blog_tag = db.Table(
+    "blog_tag",
+    db.Column("blog_id", db.Integer, db.ForeignKey("blog.id"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tag.id"), primary_key=True),
+    db.Index("ix_blog_tag_tag_blog", "tag_id", "blog_id"),
+)
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    slug = db.Column(db.String(80), unique=True, nullable=False, index=True)
+    blog_count = db.Column(db.Integer, nullable=False, default=0, server_default="0", index=True)
+
+    blogs = db.relationship("Blog", secondary=blog_tag, lazy="dynamic",
+                            backref="tag_set")
+
 
 class Blog(db.Model):
     __tablename__ = "blog"
@@ -144,6 +258,8 @@ class Blog(db.Model):
     # Metadata
     is_featured = db.Column(db.Boolean, default=False)
     views = db.Column(db.Integer, default=0)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
@@ -154,6 +270,11 @@ class Blog(db.Model):
     bookmarked_by = db.relationship("User", secondary=blog_bookmarks,
                                     backref=db.backref("saved_blogs", lazy="dynamic"))
 
+    __table_args__ = (
+        db.Index("ix_blog_created_id", "created_at", "id"),
+        db.Index("ix_blog_user_created", "user_id", "created_at"),
+    )
+
     # Utility methods
     def set_excerpt(self, char_limit=200):
         """Generate an excerpt from the blog body"""
@@ -164,11 +285,16 @@ class Blog(db.Model):
         word_count = len(self.body.split())
         self.reading_time = max(1, word_count // 200)
 
-    def like_count(self):
-        return self.likes.count()
 
-    def comment_count(self):
-        return self.comments.count()
+class BlogRelated(db.Model):
+    """Precomputed content-similarity neighbours of a blog (see app/related.py)."""
+    __tablename__ = "blog_related"
+
+    blog_id = db.Column(db.Integer, db.ForeignKey("blog.id"), primary_key=True)
+    related_id = db.Column(db.Integer, db.ForeignKey("blog.id"), primary_key=True, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.Index("ix_blog_related_blog_score", "blog_id", "score"),)
 
 
 class BlogLike(db.Model):
@@ -189,6 +315,10 @@ class BlogComment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     blog_id = db.Column(db.Integer, db.ForeignKey("blog.id"), nullable=False, index=True)
     parent_id = db.Column(db.Integer, db.ForeignKey("blog_comment.id"), nullable=True)
+    # Materialized path of zero-padded ids ("00000012/00000045/"), see app/comments.py
+    path = db.Column(db.String(255), nullable=False, default="")
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     body = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -204,6 +334,11 @@ class BlogComment(db.Model):
         cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        db.Index("ix_blog_comment_blog_path", "blog_id", "path"),
+        db.Index("ix_blog_comment_blog_parent_created", "blog_id", "parent_id", "created_at", "id"),
+    )
+
 
 # Events & registrations
 class Event(db.Model):
@@ -214,21 +349,42 @@ class Event(db.Model):
     image = db.Column(db.String(255))
     is_online = db.Column(db.Boolean, default=False)
     capacity = db.Column(db.Integer, default=100)
+    # Denormalized registration count, claimed atomically (see app/seats.py)
+    seats_taken = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
     registrations = db.relationship("EventRegistration", backref="event", lazy="dynamic", cascade="all, delete-orphan")
+    waitlist = db.relationship("EventWaitlist", backref="event", lazy="dynamic", cascade="all, delete-orphan")
+
+    __table_args__ = (db.Index("ix_event_date_id", "date", "id"),)
 
     @property
     def spots_left(self):
-        taken = self.registrations.count()
-        return max(self.capacity - taken, 0)
+        return max(self.capacity - self.seats_taken, 0)
 
 class EventRegistration(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey("event.id"), nullable=False)
     registered_at = db.Column(db.DateTime, default=datetime.utcnow)
-    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', name='uq_event_user'),)
+    # Set once the pre-event reminder went out (see app/reminders.py)
+    reminded_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'event_id', name='uq_event_user'),
+        db.Index("ix_event_registration_event_reminded", "event_id", "reminded_at"),
+    )
+
+class EventWaitlist(db.Model):
+    """Sign-ups that arrived once an event was full, promoted in order."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey("event.id"), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'event_id', name='uq_waitlist_event_user'),
+        db.Index("ix_event_waitlist_event_created", "event_id", "created_at", "id"),
+    )
 
 # Courses & registrations
 class Course(db.Model):
@@ -237,8 +393,11 @@ class Course(db.Model):
     description = db.Column(db.Text, nullable=False)
     is_live = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
     registrations = db.relationship("CourseRegistration", backref="course", lazy="dynamic", cascade="all, delete-orphan")
 
+    __table_args__ = (db.Index("ix_course_created_id", "created_at", "id"),)
+
 class CourseRegistration(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -247,12 +406,52 @@ class CourseRegistration(db.Model):
     __table_args__ = (db.UniqueConstraint('user_id', 'course_id', name='uq_course_user'),)
 
 # PDFs
+class PDFBlob(db.Model):
+    """One stored file, UPLOAD_FOLDER/<sha256>.pdf, shared by every AdminPDF
+    and UserPDF with the same content (see app/pdfs.py)."""
+    __tablename__ = "pdf_blob"
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Text extraction by `flask library index` (see app/pdf_index.py):
+    # pending -> indexing -> indexed/failed
+    text_status = db.Column(db.String(16), nullable=False, default="pending", server_default="pending")
+    text_pages = db.Column(db.Integer)  # pages with text
+    text_error = db.Column(db.Text)
+    text_updated_at = db.Column(db.DateTime)  # indexing: last heartbeat
+
+    __table_args__ = (db.Index("ix_pdf_blob_text_status", "text_status", "text_updated_at"),)
+
+    @property
+    def storage_name(self):
+        return f"{self.sha256}.pdf"
+
+
+class PDFPage(db.Model):
+    """One page of extracted text; the text itself lives in pdf_page_fts
+    under the same rowid."""
+    __tablename__ = "pdf_page"
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: pages are dropped right after their blob goes
+    sha256 = db.Column(db.String(64), nullable=False)
+    page = db.Column(db.Integer, nullable=False)  # 1-based
+
+    __table_args__ = (db.Index("ix_pdf_page_sha256_page", "sha256", "page"),)
+
+
 class AdminPDF(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    filename = db.Column(db.String(255), nullable=False)
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    filename = db.Column(db.String(255), nullable=False)  # as uploaded; the download name
+    # Content hash and size; NULL for files uploaded before blob storage
+    sha256 = db.Column(db.String(64), db.ForeignKey("pdf_blob.sha256"), index=True)
+    size = db.Column(db.BigInteger)
+    page_count = db.Column(db.Integer)  # NULL if pypdf could not read it
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (db.Index("ix_admin_pdf_title", "title"),)
 
 
 class UserPDF(db.Model):
@@ -260,11 +459,37 @@ class UserPDF(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    filename = db.Column(db.String(255), nullable=False)
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    filename = db.Column(db.String(255), nullable=False)  # as uploaded; the download name
+    sha256 = db.Column(db.String(64), db.ForeignKey("pdf_blob.sha256"), index=True)
+    size = db.Column(db.BigInteger)
+    page_count = db.Column(db.Integer)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     user = db.relationship("User", backref="pdfs")
 
+    __table_args__ = (db.Index("ix_user_pdf_user_uploaded", "user_id", "uploaded_at"),
+                      db.Index("ix_user_pdf_title", "title"))
+
+
+# Transactional email, delivered by `flask outbox work` (see app/outbox.py)
+class EmailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255))
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text)
+    html = db.Column(db.Text)
+    status = db.Column(db.String(16), nullable=False, default="pending")  # pending/sending/sent/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # pending: earliest (re)try; sending: when the worker's claim expires
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(64))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index("ix_email_outbox_status_next", "status", "next_attempt_at", "id"),)
+
 
 # app/models.py
 
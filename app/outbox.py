@@ -0,0 +1,172 @@
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+from smtplib import SMTPException, SMTPRecipientsRefused, SMTPResponseException, SMTPSenderRefused
+from flask import current_app
+from flask_mail import Message
+from .extensions import db, mail
+from .mailer import send_over
+from .models import EmailOutbox
+
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+
+
+def _claim(limit, lease):
+    """Mark up to ``limit`` due rows as ours and return them.
+
+    Due means pending with next_attempt_at reached, or sending whose claim
+    expired (the worker holding it died). The single UPDATE re-checks the
+    status, so concurrent workers never claim the same row. attempts is
+    counted here, so a message that keeps crashing its worker still runs
+    out of attempts.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = db.and_(EmailOutbox.status.in_((PENDING, SENDING)), EmailOutbox.next_attempt_at <= now)
+    ids = db.select(EmailOutbox.id).where(due) \
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit)
+    db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids.scalar_subquery()), due)
+        .values(status=SENDING, claimed_by=token, next_attempt_at=now + lease,
+                attempts=EmailOutbox.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claimed_by=token, status=SENDING) \
+        .order_by(EmailOutbox.id).all()
+
+
+def _message(row):
+    return Message(row.subject, recipients=[row.recipient], sender=row.sender,
+                   body=row.body, html=row.html)
+
+
+def _permanent(exc):
+    """Errors retrying cannot fix: rejected addresses and 5xx replies."""
+    if isinstance(exc, (SMTPRecipientsRefused, SMTPSenderRefused)):
+        return True
+    return isinstance(exc, SMTPResponseException) and exc.smtp_code >= 500
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: doubling from OUTBOX_BACKOFF
+    up to OUTBOX_BACKOFF_MAX seconds, jittered so failed batches spread out."""
+    config = current_app.config
+    delay = min(config["OUTBOX_BACKOFF"] * 2 ** (attempts - 1), config["OUTBOX_BACKOFF_MAX"])
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+class _Sender:
+    """One SMTP connection, opened on first use and kept across batches."""
+
+    def __init__(self):
+        self.conn = None
+
+    def send(self, msg):
+        if self.conn is None:
+            self.conn = mail.connect().__enter__()
+        send_over(self.conn, msg)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.__exit__(None, None, None)
+            except (SMTPException, OSError):
+                pass
+            self.conn = None
+
+
+def deliver_batch(sender, batch_size, lease):
+    """Claim and send one batch; returns ``(sent, retried, failed)``."""
+    sent = retried = failed = 0
+    max_attempts = current_app.config["OUTBOX_MAX_ATTEMPTS"]
+    for row in _claim(batch_size, lease):
+        try:
+            sender.send(_message(row))
+        except (SMTPException, OSError) as exc:
+            row.last_error = f"{type(exc).__name__}: {exc}"[:1000]
+            row.claimed_by = None
+            if _permanent(exc) or row.attempts >= max_attempts:
+                row.status = FAILED
+                failed += 1
+            else:
+                row.status = PENDING
+                row.next_attempt_at = datetime.utcnow() + backoff(row.attempts)
+                retried += 1
+            if not isinstance(exc, (SMTPRecipientsRefused, SMTPSenderRefused)):
+                sender.close()  # start the next message on a fresh connection
+        else:
+            row.status, row.sent_at, row.claimed_by = SENT, datetime.utcnow(), None
+            sent += 1
+        # Per message, so a crash re-sends at most the message in flight
+        db.session.commit()
+    db.session.expunge_all()
+    return sent, retried, failed
+
+
+def run_worker(app, concurrency=1, batch_size=None, poll_interval=None, once=False, log=None):
+    """Deliver the outbox from ``concurrency`` threads, each holding its own
+    SMTP connection open while there is mail to send.
+
+    With ``once`` the threads exit when nothing is due; otherwise they poll
+    every ``poll_interval`` seconds until interrupted. Returns the total
+    ``(sent, retried, failed)``.
+    """
+    config = app.config
+    batch_size = batch_size or config["OUTBOX_BATCH_SIZE"]
+    poll_interval = config["OUTBOX_POLL_INTERVAL"] if poll_interval is None else poll_interval
+    lease = timedelta(seconds=config["OUTBOX_LEASE"])
+    stop = threading.Event()
+    totals = [0, 0, 0]
+    lock = threading.Lock()
+
+    def work():
+        with app.app_context():
+            sender = _Sender()
+            try:
+                while not stop.is_set():
+                    counts = deliver_batch(sender, batch_size, lease)
+                    with lock:
+                        totals[:] = [a + b for a, b in zip(totals, counts)]
+                    if log and any(counts):
+                        log("sent {}, retrying {}, failed {}".format(*counts))
+                    if not any(counts):
+                        sender.close()  # idle: don't hold the connection
+                        if once:
+                            break
+                        stop.wait(poll_interval)
+            finally:
+                sender.close()
+                db.session.remove()
+
+    threads = [threading.Thread(target=work, name=f"outbox-{i}", daemon=True)
+               for i in range(max(concurrency, 1))]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            while t.is_alive():
+                t.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for t in threads:
+            t.join()
+    return tuple(totals)
+
+
+def retry_failed():
+    """Put failed messages back in the queue; returns how many."""
+    count = db.session.execute(
+        db.update(EmailOutbox).where(EmailOutbox.status == FAILED)
+        .values(status=PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def stats():
+    return dict(db.session.query(EmailOutbox.status, db.func.count())
+                .group_by(EmailOutbox.status).all())
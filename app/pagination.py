@@ -0,0 +1,101 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from .extensions import db
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict) and value.keys() == {"dt"}:
+        return datetime.fromisoformat(value["dt"])
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    raise ValueError(f"not a sort key value: {value!r}")
+
+
+def encode_cursor(*values):
+    """Pack the sort key of a row into an opaque, URL-safe token."""
+    raw = json.dumps([_dump(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Reverse encode_cursor(); returns None for a missing or mangled token,
+    including one whose values are not scalars or datetimes."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list):
+            return None
+        return tuple(_load(v) for v in values)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """One page of keyset-paginated results (see keyset_paginate)."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=10, descending=True, row_key=None):
+    """Paginate ``query`` on a unique sort key instead of OFFSET/COUNT.
+
+    ``columns`` is the sort key, e.g. ``(Post.created_at, Post.id)``; the last
+    column must make it unique. ``cursor`` is a token from a previous page's
+    ``next_cursor``/``prev_cursor``. Every page, however deep, is a single
+    indexed range scan of ``per_page + 1`` rows. ``row_key(row)`` gives a row's
+    sort key when the columns are not attributes of the row (e.g. they
+    belong to a joined association table).
+    """
+    token = decode_cursor(cursor)
+    backwards, key = False, None
+    if token and len(token) == len(columns) + 1 and token[0] in ("next", "prev"):
+        backwards, key = token[0] == "prev", token[1:]
+
+    # Walking back through a descending list is an ascending scan, and vice versa
+    scan_desc = descending != backwards
+    if key is not None:
+        sort_key = db.tuple_(*columns)
+        query = query.filter(sort_key < key if scan_desc else sort_key > key)
+    query = query.order_by(*[c.desc() if scan_desc else c.asc() for c in columns])
+
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows)
+
+    def key_of(row):
+        if row_key is not None:
+            return list(row_key(row))
+        return [getattr(row, c.key) for c in columns]
+
+    has_next = more if not backwards else key is not None
+    has_prev = more if backwards else key is not None
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor("next", *key_of(rows[-1])) if has_next else None,
+        prev_cursor=encode_cursor("prev", *key_of(rows[0])) if has_prev else None,
+    )
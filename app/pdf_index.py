@@ -0,0 +1,206 @@
+import re
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from pypdf import PdfReader
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import joinedload
+from .extensions import db
+from .models import User, AdminPDF, UserPDF, PDFBlob, PDFPage
+from .pagination import KeysetPage, encode_cursor, decode_cursor
+from .pdfs import blob_path
+from .search import fts_enabled, to_match_query, highlight
+
+# Page text of library PDFs; rowid is pdf_page.id
+PDF_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS pdf_page_fts USING fts5("
+    "body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+PENDING, INDEXING, INDEXED, FAILED = "pending", "indexing", "indexed", "failed"
+
+event.listen(PDFPage.__table__, "after_create", DDL(PDF_FTS_DDL).execute_if(dialect="sqlite"))
+
+PageHit = namedtuple("PageHit", "pdf page snippet")
+
+
+def _clean(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def forget(sha256):
+    """Drop a blob's pages from the index (call with its last reference)."""
+    ids = db.select(PDFPage.id).where(PDFPage.sha256 == sha256)
+    if fts_enabled():
+        db.session.execute(db.text("DELETE FROM pdf_page_fts WHERE rowid IN (SELECT id FROM pdf_page "
+                                   "WHERE sha256 = :sha256)"), {"sha256": sha256})
+    db.session.execute(db.delete(PDFPage).where(PDFPage.id.in_(ids)).execution_options(synchronize_session=False))
+
+
+def _claim(lease):
+    """Take the oldest blob waiting for extraction, or one whose indexer
+    stopped sending heartbeats. Returns its sha256, or None."""
+    now = datetime.utcnow()
+    due = db.or_(PDFBlob.text_status == PENDING,
+                 db.and_(PDFBlob.text_status == INDEXING, PDFBlob.text_updated_at < now - lease))
+    sha256 = db.session.execute(
+        db.select(PDFBlob.sha256).where(due).order_by(PDFBlob.created_at).limit(1)
+    ).scalar()
+    if sha256 is None:
+        return None
+    # rowcount 0: another indexer claimed it first
+    claimed = db.session.execute(
+        db.update(PDFBlob).where(PDFBlob.sha256 == sha256, due)
+        .values(text_status=INDEXING, text_updated_at=now, text_error=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return sha256 if claimed else _claim(lease)
+
+
+def _write_pages(sha256, pages):
+    """Insert buffered ``[(page, text)]`` and renew the claim, in one short
+    transaction so SQLite's write lock isn't held while pages are parsed."""
+    for number, text in pages:
+        row = PDFPage(sha256=sha256, page=number)
+        db.session.add(row)
+        db.session.flush()
+        db.session.execute(db.text("INSERT INTO pdf_page_fts (rowid, body) VALUES (:id, :body)"),
+                           {"id": row.id, "body": text})
+    db.session.execute(
+        db.update(PDFBlob).where(PDFBlob.sha256 == sha256)
+        .values(text_updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    db.session.expunge_all()
+    pages.clear()
+
+
+def _fill_page_count(sha256, page_count):
+    """Rows uploaded before page counts were stored get theirs here."""
+    for model in (AdminPDF, UserPDF):
+        db.session.execute(
+            db.update(model).where(model.sha256 == sha256, model.page_count.is_(None))
+            .values(page_count=page_count)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def index_blob(sha256, batch_pages=None):
+    """Extract the text of one stored PDF into pdf_page/pdf_page_fts.
+
+    pypdf parses one page at a time from the file on disk, and page text is
+    written out every ``batch_pages`` pages, so memory stays flat however
+    long the document is. Returns pages with text; any error is logged and
+    recorded on the blob as text_status="failed".
+    """
+    batch_pages = batch_pages or current_app.config["PDF_INDEX_BATCH_PAGES"]
+    forget(sha256)  # a previous, interrupted run
+    db.session.commit()
+    buffered, found = [], 0
+    try:
+        with open(blob_path(sha256), "rb") as f:
+            reader = PdfReader(f)
+            if reader.is_encrypted:
+                reader.decrypt("")
+            _fill_page_count(sha256, len(reader.pages))
+            for number, page in enumerate(reader.pages, 1):
+                text = _clean(page.extract_text())
+                if text:
+                    buffered.append((number, text))
+                    found += 1
+                if len(buffered) >= batch_pages:
+                    _write_pages(sha256, buffered)
+        _write_pages(sha256, buffered)
+        values = {"text_status": INDEXED, "text_pages": found}
+    except Exception as exc:
+        # pypdf can raise almost anything on a malformed upload; one bad
+        # file must not stop the indexer or be claimed again forever
+        db.session.rollback()
+        current_app.logger.warning("Could not index PDF %s", sha256, exc_info=True)
+        values = {"text_status": FAILED, "text_error": f"{type(exc).__name__}: {exc}"[:1000]}
+    finished = db.session.execute(
+        db.update(PDFBlob).where(PDFBlob.sha256 == sha256)
+        .values(text_updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not finished:
+        forget(sha256)  # the last reference was deleted while we worked
+    db.session.commit()
+    return found
+
+
+def run_indexer(poll_interval=None, once=False, log=None):
+    """Index pending blobs until interrupted (or, with ``once``, until none
+    are left). Returns blobs processed."""
+    config = current_app.config
+    poll_interval = config["PDF_INDEX_POLL_INTERVAL"] if poll_interval is None else poll_interval
+    lease = timedelta(seconds=config["PDF_INDEX_LEASE"])
+    done = 0
+    try:
+        while True:
+            sha256 = _claim(lease)
+            if sha256 is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+            pages = index_blob(sha256)
+            done += 1
+            if log:
+                log(f"{sha256[:12]}: {pages} pages with text")
+    except KeyboardInterrupt:
+        pass
+    return done
+
+
+def reindex_all():
+    """Queue every blob for extraction again; returns how many."""
+    count = db.session.execute(
+        db.update(PDFBlob).values(text_status=PENDING, text_updated_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+def search_pages(model, text, cursor=None, per_page=20):
+    """Page-level hits for ``text`` in the AdminPDF or UserPDF library.
+
+    Returns a KeysetPage of PageHit(pdf, page, snippet), best bm25 match
+    first; cursors carry an offset. A blob shared by several rows yields a
+    hit for each of them.
+    """
+    match = to_match_query(text)
+    if not match or not fts_enabled():
+        return KeysetPage([])
+
+    token = decode_cursor(cursor)
+    offset = token[1] if token and len(token) == 2 and isinstance(token[1], int) else 0
+    offset = max(offset, 0)
+
+    rows = db.session.execute(db.text(
+        "SELECT p.sha256, p.page, snippet(pdf_page_fts, 0, char(2), char(3), '…', 16) "
+        "FROM pdf_page_fts JOIN pdf_page p ON p.id = pdf_page_fts.rowid "
+        f"WHERE pdf_page_fts MATCH :match AND p.sha256 IN (SELECT sha256 FROM {model.__tablename__}) "
+        "ORDER BY rank, p.id LIMIT :limit OFFSET :offset"
+    ), {"match": match, "limit": per_page + 1, "offset": offset}).all()
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    query = model.query.filter(model.sha256.in_({r[0] for r in rows}))
+    if hasattr(model, "user"):
+        query = query.options(joinedload(model.user).joinedload(User.profile))
+    by_sha = {}
+    for pdf in query.order_by(model.id):
+        by_sha.setdefault(pdf.sha256, []).append(pdf)
+    hits = [PageHit(pdf, page, highlight(snippet))
+            for sha256, page, snippet in rows for pdf in by_sha.get(sha256, [])]
+
+    return KeysetPage(
+        hits,
+        next_cursor=encode_cursor("next", offset + per_page) if more else None,
+        prev_cursor=encode_cursor("prev", max(offset - per_page, 0)) if offset else None,
+    )
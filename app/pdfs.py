@@ -0,0 +1,229 @@
+import hashlib
+import os
+import tempfile
+import unicodedata
+from urllib.parse import quote
+from flask import current_app, request, send_from_directory
+from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import safe_join
+from .extensions import db
+from .models import AdminPDF, UserPDF, PDFBlob
+
+CHUNK_SIZE = 64 * 1024
+# The PDF header may be preceded by junk, but must start within 1 KB
+_HEADER_WINDOW = 1024
+
+
+class PDFError(ValueError):
+    """The upload is not a PDF."""
+
+
+def upload_folder():
+    folder = current_app.config["UPLOAD_FOLDER"]
+    if not os.path.isabs(folder):
+        folder = os.path.join(current_app.root_path, folder)
+    return folder
+
+
+def blob_path(sha256):
+    return os.path.join(upload_folder(), f"{sha256}.pdf")
+
+
+def _spool(stream, folder):
+    """Copy ``stream`` into a temp file in ``folder``, hashing as it goes.
+    Returns ``(temp path, sha256, size)``."""
+    digest, size = hashlib.sha256(), 0
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                if not size and b"%PDF-" not in chunk[:_HEADER_WINDOW]:
+                    raise PDFError("not a PDF file")
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        if not size:
+            raise PDFError("empty file")
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp, digest.hexdigest(), size
+
+
+def _add_ref(sha256, size):
+    """Count one more reference to a blob, creating its row if needed."""
+    bumped = db.session.execute(
+        db.update(PDFBlob).where(PDFBlob.sha256 == sha256)
+        .values(ref_count=PDFBlob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if bumped:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(PDFBlob(sha256=sha256, size=size, ref_count=1))
+    except IntegrityError:
+        # A concurrent upload of the same file created it first
+        _add_ref(sha256, size)
+
+
+def count_pages(path):
+    """Number of pages in a stored PDF, or None if pypdf cannot read it.
+    Only the xref table and page tree are parsed, not page contents."""
+    try:
+        with open(path, "rb") as f:
+            reader = PdfReader(f)
+            if reader.is_encrypted:
+                reader.decrypt("")
+            return len(reader.pages)
+    except (OSError, PyPdfError, ValueError, KeyError):
+        return None
+
+
+def store(stream):
+    """Stream an upload into blob storage and take a reference to it.
+
+    The file is written to a temp file while its SHA-256 is computed. The
+    reference is taken first, which holds SQLite's writer lock until the
+    caller commits, and the file is then always renamed to
+    ``<sha256>.pdf``: the content is identical if it was stored already,
+    and a concurrent unlink() of the same blob either finished before the
+    reference was taken or waits for the commit (see unlink()).
+    Returns ``(sha256, size, page_count)`` for the new AdminPDF/UserPDF row,
+    so listings never have to open the file. Raises PDFError if the upload
+    is not a PDF.
+    """
+    folder = upload_folder()
+    os.makedirs(folder, exist_ok=True)
+    tmp, sha256, size = _spool(stream, folder)
+    final = blob_path(sha256)
+    try:
+        _add_ref(sha256, size)
+        os.replace(tmp, final)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return sha256, size, count_pages(final)
+
+
+def release(sha256):
+    """Drop one reference; when it was the last, delete the blob row too.
+    Returns True if the file should be unlinked once the caller commits
+    (see unlink())."""
+    if not sha256:
+        return False
+    db.session.execute(
+        db.update(PDFBlob).where(PDFBlob.sha256 == sha256)
+        .values(ref_count=PDFBlob.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    return db.session.execute(
+        db.delete(PDFBlob).where(PDFBlob.sha256 == sha256, PDFBlob.ref_count <= 0)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def unlink(sha256):
+    """Remove a released blob's file after the commit, unless an upload
+    referenced the same content again in the meantime.
+
+    A no-op UPDATE takes the writer lock first, so an upload that has taken
+    its reference but not committed yet is waited for, and one that comes
+    later waits until the file is gone before writing it again.
+    """
+    db.session.execute(
+        db.update(PDFBlob).where(PDFBlob.sha256 == sha256)
+        .values(ref_count=PDFBlob.ref_count)
+        .execution_options(synchronize_session=False)
+    )
+    referenced = db.session.execute(
+        db.select(PDFBlob.sha256).where(PDFBlob.sha256 == sha256)
+    ).first()
+    if referenced is None:
+        try:
+            os.unlink(blob_path(sha256))
+        except FileNotFoundError:
+            pass
+    db.session.commit()
+
+
+def _disposition(response, kind, download_name):
+    """Content-Disposition the way send_file() writes it (RFC 2231 for
+    non-ASCII names)."""
+    try:
+        download_name.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", download_name).encode("ascii", "ignore").decode("ascii")
+        quoted = quote(download_name, safe="!#$&+^`|~")
+        response.headers.set("Content-Disposition", kind, filename=simple, **{"filename*": f"UTF-8''{quoted}"})
+    else:
+        response.headers.set("Content-Disposition", kind, filename=download_name)
+
+
+def send(pdf, as_attachment=True):
+    """Response for downloading an AdminPDF/UserPDF; the caller has
+    authorized the request.
+
+    Blobs are immutable, so their hash is a strong ETag and the upload time
+    the Last-Modified; If-None-Match/If-Modified-Since get a 304 and Range
+    requests a 206, which lets PDF viewers fetch single pages. With
+    PDF_ACCEL_REDIRECT set, the body is left to nginx (X-Accel-Redirect to
+    that internal location); with USE_X_SENDFILE, send_file() hands the
+    path to Apache/lighttpd instead. Either way no worker streams bytes.
+    """
+    # Rows from before blob storage still point at the uploaded name
+    name = f"{pdf.sha256}.pdf" if pdf.sha256 else pdf.filename
+    max_age = current_app.config["PDF_CACHE_MAX_AGE"]
+    accel = current_app.config["PDF_ACCEL_REDIRECT"]
+
+    if accel:
+        response = current_app.response_class(mimetype="application/pdf")
+        response.headers["X-Accel-Redirect"] = f"{accel.rstrip('/')}/{quote(name)}"
+        _disposition(response, "attachment" if as_attachment else "inline", pdf.filename)
+        if pdf.sha256:
+            response.set_etag(pdf.sha256)
+        response.last_modified = pdf.uploaded_at
+        response.cache_control.private = True
+        response.cache_control.max_age = max_age
+        # Revalidations are answered here; nginx serves bodies and ranges
+        return response.make_conditional(request, accept_ranges=False)
+
+    response = send_from_directory(
+        upload_folder(), name, mimetype="application/pdf",
+        as_attachment=as_attachment, download_name=pdf.filename,
+        etag=pdf.sha256 or True, last_modified=pdf.uploaded_at, max_age=max_age,
+    )
+    # send_file() marks anything with a max_age public; these need a login
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+
+def migrate_legacy(log=None):
+    """Move files saved under their upload name into blob storage and point
+    their rows at the blobs. A file is removed once no row uses its old name.
+    Returns rows migrated."""
+    folder = upload_folder()
+    migrated = 0
+    for model in (AdminPDF, UserPDF):
+        for pdf in model.query.filter(model.sha256.is_(None)).order_by(model.id).all():
+            path = safe_join(folder, pdf.filename)
+            if path is None:
+                continue
+            try:
+                with open(path, "rb") as f:
+                    pdf.sha256, pdf.size, pdf.page_count = store(f)
+            except (OSError, PDFError) as exc:
+                if log:
+                    log(f"skipped {model.__tablename__} {pdf.id}: {exc}")
+                continue
+            db.session.commit()
+            migrated += 1
+            still_used = any(m.query.filter(m.sha256.is_(None), m.filename == pdf.filename).count()
+                             for m in (AdminPDF, UserPDF))
+            if not still_used and os.path.basename(path) != f"{pdf.sha256}.pdf":
+                os.unlink(path)
+    return migrated
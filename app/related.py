@@ -0,0 +1,169 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from flask import current_app
+from .extensions import db
+from .models import Blog, BlogRelated
+from .search import strip_html, fts_enabled
+
+# Terms kept per document vector; bounds both storage and scoring cost
+MAX_TERMS = 50
+# Terms of the saved blog used to fetch candidate neighbours from blog_fts
+QUERY_TERMS = 12
+CANDIDATES = 50
+# Below this cosine two blogs only share near-ubiquitous words
+MIN_SCORE = 0.05
+
+STOPWORDS = frozenset("""
+a about an and are as at be but by for from has have in is it its of on or
+that the this to was were will with we you your our their they he she his her
+not no can may also more most than then there these those which who what when
+""".split())
+
+
+def tokenize(text):
+    """Lower-cased, accent-folded word tokens, matching blog_fts's unicode61."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return [w for w in re.findall(r"[^\W_]+", text) if len(w) > 2 and w not in STOPWORDS]
+
+
+def term_counts(blog):
+    # Title and tags say more about a blog than any single body word
+    counts = Counter(tokenize(strip_html(blog.body)))
+    for w in tokenize(blog.title):
+        counts[w] += 3
+    for w in tokenize((blog.tags or "").replace(",", " ")):
+        counts[w] += 2
+    return counts
+
+
+def vectorize(counts, df, n_docs):
+    """Sublinear TF-IDF, truncated to MAX_TERMS and L2-normalized."""
+    weights = {
+        t: (1 + math.log(tf)) * math.log((1 + n_docs) / (1 + df.get(t, 1)))
+        for t, tf in counts.items()
+    }
+    top = heapq.nlargest(MAX_TERMS, weights.items(), key=lambda kv: kv[1])
+    norm = math.sqrt(sum(w * w for _, w in top)) or 1.0
+    return {t: w / norm for t, w in top if w > 0}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b[t] for t, w in a.items() if t in b)
+
+
+def _top_k():
+    return current_app.config["RELATED_TOP_K"]
+
+
+def rebuild_all():
+    """Offline batch: exact top-k neighbours for every blog. Returns blogs scored."""
+    counts = {}
+    for blog in Blog.query.order_by(Blog.id).yield_per(500):
+        counts[blog.id] = term_counts(blog)
+
+    df = Counter()
+    for c in counts.values():
+        df.update(c.keys())
+    n_docs = len(counts)
+    vectors = {bid: vectorize(c, df, n_docs) for bid, c in counts.items()}
+
+    # Inverted index so each blog is only scored against blogs sharing a term
+    postings = defaultdict(list)
+    for bid, vec in vectors.items():
+        for t, w in vec.items():
+            if df[t] > 1:
+                postings[t].append((bid, w))
+
+    k = _top_k()
+    db.session.execute(db.delete(BlogRelated))
+    rows = []
+    for bid, vec in vectors.items():
+        scores = defaultdict(float)
+        for t, w in vec.items():
+            for other, ow in postings.get(t, ()):
+                if other != bid:
+                    scores[other] += w * ow
+        for other, score in heapq.nlargest(k, scores.items(), key=lambda kv: kv[1]):
+            if score < MIN_SCORE:
+                break
+            rows.append({"blog_id": bid, "related_id": other, "score": score})
+    if rows:
+        db.session.execute(db.insert(BlogRelated), rows)
+    db.session.commit()
+    return n_docs
+
+
+def _document_frequencies(terms):
+    if not terms:
+        return {}
+    rows = db.session.execute(
+        db.text("SELECT term, doc FROM blog_fts_vocab WHERE term IN :terms")
+        .bindparams(db.bindparam("terms", expanding=True)),
+        {"terms": list(terms)},
+    )
+    return dict(rows.all())
+
+
+def update_for(blog):
+    """Incremental refresh after blogs.create/blogs.edit (call after flush).
+
+    Candidates come from the blog_fts index via the blog's strongest
+    terms, so the cost depends on CANDIDATES rather than the corpus size.
+    The blog's own neighbours are replaced and it is merged into the
+    lists of its top-k neighbours.
+    """
+    if not fts_enabled():
+        return
+    n_docs = db.session.query(db.func.count(Blog.id)).scalar()
+    counts = term_counts(blog)
+    vec = vectorize(counts, _document_frequencies(counts.keys()), n_docs)
+
+    query_terms = heapq.nlargest(QUERY_TERMS, vec, key=vec.get)
+    candidates = []
+    if query_terms:
+        match = " OR ".join(f'"{t}"' for t in query_terms)
+        ids = db.session.execute(
+            db.text("SELECT rowid FROM blog_fts WHERE blog_fts MATCH :m AND rowid != :id "
+                    "ORDER BY rank LIMIT :n"),
+            {"m": match, "id": blog.id, "n": CANDIDATES},
+        ).scalars().all()
+        candidates = Blog.query.filter(Blog.id.in_(ids)).all() if ids else []
+
+    cand_counts = {c.id: term_counts(c) for c in candidates}
+    vocab = set().union(*cand_counts.values()) if cand_counts else set()
+    df = _document_frequencies(vocab)
+    scored = [(cosine(vec, vectorize(c, df, n_docs)), cid) for cid, c in cand_counts.items()]
+
+    k = _top_k()
+    neighbours = [(s, cid) for s, cid in heapq.nlargest(k, scored) if s >= MIN_SCORE]
+
+    BlogRelated.query.filter_by(blog_id=blog.id).delete(synchronize_session=False)
+    for score, cid in neighbours:
+        db.session.add(BlogRelated(blog_id=blog.id, related_id=cid, score=score))
+        # Similarity is symmetric: offer this blog to the neighbour's list too
+        BlogRelated.query.filter_by(blog_id=cid, related_id=blog.id).delete(synchronize_session=False)
+        db.session.add(BlogRelated(blog_id=cid, related_id=blog.id, score=score))
+        db.session.flush()
+        keep = db.select(BlogRelated.related_id).where(BlogRelated.blog_id == cid) \
+            .order_by(BlogRelated.score.desc()).limit(k)
+        BlogRelated.query.filter(BlogRelated.blog_id == cid, BlogRelated.related_id.not_in(keep)) \
+            .delete(synchronize_session=False)
+
+
+def forget(blog):
+    BlogRelated.query.filter(
+        (BlogRelated.blog_id == blog.id) | (BlogRelated.related_id == blog.id)
+    ).delete(synchronize_session=False)
+
+
+def related_blogs(blog, limit=3):
+    """Precomputed neighbours, best first: one lookup on (blog_id, score)."""
+    return Blog.query.join(BlogRelated, BlogRelated.related_id == Blog.id) \
+        .filter(BlogRelated.blog_id == blog.id) \
+        .order_by(BlogRelated.score.desc()).limit(limit).all()
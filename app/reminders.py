@@ -0,0 +1,102 @@
+import re
+import time
+from datetime import datetime, timedelta
+from smtplib import SMTPRecipientsRefused
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from .extensions import db, mail
+from .mailer import event_reminder_message, send_over
+from .models import User, Event, EventRegistration
+
+_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+
+def parse_window(text):
+    """'24h' / '90m' / '2d' -> timedelta; ValueError otherwise."""
+    match = re.fullmatch(r"\s*(\d+)\s*([mhd])\s*", text or "")
+    if not match:
+        raise ValueError(f"invalid window {text!r}, expected e.g. 24h, 90m or 2d")
+    return timedelta(**{_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def _due(now, until, after_id, limit):
+    """Next chunk of un-reminded registrations for events starting in
+    (now, until], in id order so the scan can resume after ``after_id``."""
+    return (
+        db.session.query(EventRegistration, User, Event)
+        .join(User, User.id == EventRegistration.user_id)
+        .join(Event, Event.id == EventRegistration.event_id)
+        .options(joinedload(User.profile))
+        .filter(Event.date > now, Event.date <= until,
+                EventRegistration.reminded_at.is_(None),
+                EventRegistration.id > after_id)
+        .order_by(EventRegistration.id)
+        .limit(limit)
+        .all()
+    )
+
+
+class _Throttle:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if self.interval:
+            delay = self.next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_at = max(self.next_at, time.monotonic()) + self.interval
+
+
+def send_event_reminders(window, rate=None, chunk_size=None, log=None):
+    """Remind everyone registered for an event starting within ``window``.
+
+    Registrations are streamed in chunks and every message goes over one
+    SMTP connection, paced at ``rate`` messages per second. The reminded_at
+    of a chunk's accepted messages is committed with one UPDATE when the
+    chunk ends, or is cut short by an error or interrupt, so a rerun picks
+    up where it stopped; only a hard kill mid-chunk can repeat that chunk's
+    reminders. Returns ``(sent, refused)``.
+    """
+    config = current_app.config
+    rate = config["EVENT_REMINDER_RATE"] if rate is None else rate
+    chunk_size = chunk_size or config["EVENT_REMINDER_CHUNK"]
+    now = datetime.utcnow()
+    throttle = _Throttle(rate)
+    sent = refused = after_id = 0
+
+    with mail.connect() as conn:
+        while True:
+            rows = _due(now, now + window, after_id, chunk_size)
+            if not rows:
+                break
+            reminded = []
+            try:
+                for registration, user, event in rows:
+                    after_id = registration.id
+                    throttle.wait()
+                    try:
+                        send_over(conn, event_reminder_message(user, event))
+                    except SMTPRecipientsRefused:
+                        refused += 1
+                        if log:
+                            log(f"refused: {user.email} (event {event.id})")
+                        continue
+                    reminded.append(registration.id)
+            finally:
+                _mark_reminded(reminded)
+            sent += len(reminded)
+            db.session.expunge_all()
+    return sent, refused
+
+
+def _mark_reminded(ids):
+    if ids:
+        db.session.execute(
+            db.update(EventRegistration)
+            .where(EventRegistration.id.in_(ids))
+            .values(reminded_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
@@ -0,0 +1,179 @@
+import re
+from html import unescape
+from html.parser import HTMLParser
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, event, inspect
+from sqlalchemy.orm import joinedload
+from .extensions import db
+from .models import User, Blog
+from .pagination import KeysetPage, encode_cursor, decode_cursor
+
+# FTS5 index over blogs; rowid is blog.id. The body is stored HTML-stripped,
+# which is why it is kept in step from ORM events rather than SQL triggers.
+BLOG_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blog_fts USING fts5("
+    "title, body, tags, category, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+BLOG_FTS_COLUMNS = ("title", "body", "tags", "category")
+
+# Per-term document frequencies of blog_fts, used by app/related.py
+BLOG_FTS_VOCAB_DDL = "CREATE VIRTUAL TABLE IF NOT EXISTS blog_fts_vocab USING fts5vocab(blog_fts, 'row')"
+
+# bm25 column weights, in BLOG_FTS_COLUMNS order
+BLOG_RANK = "bm25(blog_fts, 10.0, 1.0, 5.0, 2.0)"
+
+# Snippet delimiters; swapped for <mark> only after the text is escaped
+_HL_OPEN, _HL_CLOSE = "\x02", "\x03"
+
+event.listen(Blog.__table__, "after_create", DDL(BLOG_FTS_DDL).execute_if(dialect="sqlite"))
+event.listen(Blog.__table__, "after_create", DDL(BLOG_FTS_VOCAB_DDL).execute_if(dialect="sqlite"))
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def strip_html(html):
+    """Plain text of an HTML fragment (blog bodies come from CKEditor)."""
+    parser = _TextExtractor()
+    parser.feed(html or "")
+    parser.close()
+    return re.sub(r"\s+", " ", unescape(" ".join(parser.parts))).strip()
+
+
+def fts_enabled():
+    return db.engine.dialect.name == "sqlite"
+
+
+def _blog_row(blog):
+    return {"rowid": blog.id, "title": blog.title, "body": strip_html(blog.body),
+            "tags": blog.tags or "", "category": blog.category or ""}
+
+
+def _index(connection, blog):
+    connection.execute(db.text("DELETE FROM blog_fts WHERE rowid = :id"), {"id": blog.id})
+    connection.execute(
+        db.text("INSERT INTO blog_fts (rowid, title, body, tags, category) "
+                "VALUES (:rowid, :title, :body, :tags, :category)"),
+        _blog_row(blog),
+    )
+
+
+@event.listens_for(Blog, "after_insert")
+def _blog_inserted(mapper, connection, blog):
+    if connection.dialect.name == "sqlite":
+        _index(connection, blog)
+
+
+@event.listens_for(Blog, "after_update")
+def _blog_updated(mapper, connection, blog):
+    if connection.dialect.name != "sqlite":
+        return
+    state = inspect(blog)
+    # Counter and view bumps also land here; only re-index on content edits
+    if any(state.attrs[name].history.has_changes() for name in BLOG_FTS_COLUMNS):
+        _index(connection, blog)
+
+
+@event.listens_for(Blog, "after_delete")
+def _blog_deleted(mapper, connection, blog):
+    if connection.dialect.name == "sqlite":
+        connection.execute(db.text("DELETE FROM blog_fts WHERE rowid = :id"), {"id": blog.id})
+
+
+def to_match_query(text):
+    """Turn free user input into a safe FTS5 query: every word must match,
+    as a prefix, and FTS5 operators in the input are ignored."""
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def highlight(snippet):
+    return Markup(str(escape(snippet)).replace(_HL_OPEN, "<mark>").replace(_HL_CLOSE, "</mark>"))
+
+
+def search_blogs(text, category=None, cursor=None, per_page=10):
+    """Rank blogs matching ``text`` with bm25.
+
+    Returns ``(page, snippets)``: a KeysetPage of Blog objects (cursors
+    carry an offset into the ranked result) and a ``{blog_id: Markup}``
+    map of highlighted body snippets.
+    """
+    match = to_match_query(text)
+    if not match:
+        return KeysetPage([]), {}
+
+    token = decode_cursor(cursor)
+    offset = token[1] if token and len(token) == 2 and isinstance(token[1], int) else 0
+    offset = max(offset, 0)
+
+    sql = (
+        "SELECT blog_fts.rowid, "
+        "snippet(blog_fts, 1, char(2), char(3), '…', 24) "
+        "FROM blog_fts JOIN blog ON blog.id = blog_fts.rowid "
+        "WHERE blog_fts MATCH :match"
+        + (" AND blog.category = :category" if category else "")
+        + f" ORDER BY {BLOG_RANK}, blog_fts.rowid LIMIT :limit OFFSET :offset"
+    )
+    rows = db.session.execute(db.text(sql), {
+        "match": match, "category": category, "limit": per_page + 1, "offset": offset,
+    }).all()
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    by_id = {b.id: b for b in Blog.query.options(joinedload(Blog.user).selectinload(User.profile))
+             .filter(Blog.id.in_([r[0] for r in rows]))}
+    blogs = [by_id[r[0]] for r in rows if r[0] in by_id]
+    snippets = {r[0]: highlight(r[1]) for r in rows}
+
+    page = KeysetPage(
+        blogs,
+        next_cursor=encode_cursor("next", offset + per_page) if more else None,
+        prev_cursor=encode_cursor("prev", max(offset - per_page, 0)) if offset else None,
+    )
+    return page, snippets
+
+
+def rebuild_blog_index(batch_size=500):
+    """Re-create the blog FTS index from the blog table; returns rows indexed."""
+    db.session.execute(db.text(BLOG_FTS_DDL))
+    db.session.execute(db.text(BLOG_FTS_VOCAB_DDL))
+    db.session.execute(db.text("DELETE FROM blog_fts"))
+    count = 0
+    rows = []
+    for blog in Blog.query.order_by(Blog.id).yield_per(batch_size):
+        rows.append(_blog_row(blog))
+        if len(rows) >= batch_size:
+            count += _flush_rows(rows)
+    count += _flush_rows(rows)
+    db.session.execute(db.text("INSERT INTO blog_fts (blog_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return count
+
+
+def _flush_rows(rows):
+    if rows:
+        db.session.execute(
+            db.text("INSERT INTO blog_fts (rowid, title, body, tags, category) "
+                    "VALUES (:rowid, :title, :body, :tags, :category)"),
+            rows,
+        )
+    n = len(rows)
+    rows.clear()
+    return n
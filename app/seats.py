@@ -0,0 +1,123 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .mailer import send_event_registration
+from .models import User, Event, EventRegistration, EventWaitlist
+
+REGISTERED = "registered"
+WAITLISTED = "waitlisted"
+ALREADY_REGISTERED = "already_registered"
+ALREADY_WAITLISTED = "already_waitlisted"
+
+
+def _claim_seat(event_id):
+    """Take one seat if any is left. A single conditional UPDATE, so
+    concurrent sign-ups can never push seats_taken past capacity."""
+    return db.session.execute(
+        db.update(Event)
+        .where(Event.id == event_id, Event.seats_taken < Event.capacity)
+        .values(seats_taken=Event.seats_taken + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def _release_seat(event_id):
+    db.session.execute(
+        db.update(Event).where(Event.id == event_id)
+        .values(seats_taken=Event.seats_taken - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reserve(event, user):
+    """Register ``user`` for ``event``, or waitlist them once it is full.
+
+    Duplicates are caught by the uq_event_user / uq_waitlist_event_user
+    constraints instead of a pre-check SELECT; a rejected registration
+    rolls its seat claim back with it. The confirmation email is queued in
+    the same transaction. Commits, and returns one of REGISTERED,
+    WAITLISTED, ALREADY_REGISTERED or ALREADY_WAITLISTED.
+    """
+    if _claim_seat(event.id):
+        try:
+            db.session.add(EventRegistration(user_id=user.id, event_id=event.id))
+            db.session.flush()
+            EventWaitlist.query.filter_by(user_id=user.id, event_id=event.id) \
+                .delete(synchronize_session=False)
+            send_event_registration(user, event)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return ALREADY_REGISTERED
+        return REGISTERED
+
+    # Full: queue up, unless already holding a seat
+    registered = db.select(EventRegistration.id).where(
+        EventRegistration.user_id == user.id, EventRegistration.event_id == event.id)
+    try:
+        queued = db.session.execute(
+            db.insert(EventWaitlist).from_select(
+                ["user_id", "event_id", "created_at"],
+                db.select(db.literal(user.id), db.literal(event.id),
+                          db.literal(datetime.utcnow(), db.DateTime))
+                .where(~registered.exists()),
+            )
+        ).rowcount
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return ALREADY_WAITLISTED
+    return WAITLISTED if queued else ALREADY_REGISTERED
+
+
+def _promote_next(event):
+    """Hand a freed seat to the head of the waitlist and queue their
+    confirmation email; returns their user id, or None if nobody is waiting."""
+    while True:
+        head = EventWaitlist.query.filter_by(event_id=event.id) \
+            .order_by(EventWaitlist.created_at, EventWaitlist.id).first()
+        if head is None:
+            return None
+        # rowcount 0: a concurrent cancellation promoted them first
+        if EventWaitlist.query.filter_by(id=head.id).delete(synchronize_session=False):
+            db.session.add(EventRegistration(user_id=head.user_id, event_id=event.id))
+            send_event_registration(db.session.get(User, head.user_id), event)
+            return head.user_id
+
+
+def cancel(event, user):
+    """Drop ``user``'s registration or waitlist entry. A freed seat goes to
+    the first waitlisted user in the same transaction. Commits, and returns
+    the promoted user's id, if any."""
+    promoted = None
+    dropped = EventRegistration.query.filter_by(user_id=user.id, event_id=event.id) \
+        .delete(synchronize_session=False)
+    if dropped:
+        promoted = _promote_next(event)
+        if promoted is None:
+            _release_seat(event.id)
+    else:
+        EventWaitlist.query.filter_by(user_id=user.id, event_id=event.id) \
+            .delete(synchronize_session=False)
+    db.session.commit()
+    return promoted
+
+
+def fill_from_waitlist(event):
+    """Promote waitlisted users into free seats, e.g. after capacity was
+    raised. Commits, and returns the promoted user ids."""
+    promoted = []
+    while _claim_seat(event.id):
+        user_id = _promote_next(event)
+        if user_id is None:
+            _release_seat(event.id)
+            break
+        promoted.append(user_id)
+    db.session.commit()
+    return promoted
+
+
+def is_waitlisted(event, user):
+    return db.session.query(
+        EventWaitlist.query.filter_by(user_id=user.id, event_id=event.id).exists()
+    ).scalar()
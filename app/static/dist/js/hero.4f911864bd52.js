@@ -0,0 +1,66 @@
+// Home page hero. Plain React.createElement calls, so no in-browser JSX
+// transpiler is needed; expects the React and ReactDOM bundles to be loaded.
+(function () {
+  const { useEffect, useRef, createElement: h } = React;
+
+  function AnimatedBlob({ className = '', style = {} }) {
+    return h('svg', {
+        className, style, viewBox: '0 0 600 600', xmlns: 'http://www.w3.org/2000/svg',
+        preserveAspectRatio: 'xMidYMid slice',
+      },
+      h('defs', null,
+        h('linearGradient', { id: 'h1', x1: '0%', x2: '100%', y1: '0%', y2: '100%' },
+          h('stop', { stopColor: '#60a5fa', offset: '0%' }),
+          h('stop', { stopColor: '#7c3aed', offset: '50%' }),
+          h('stop', { stopColor: '#f472b6', offset: '100%' }))),
+      h('g', null,
+        h('path', {
+          fill: 'url(#h1)',
+          d: 'M421.6,346.8Q403,443.6,322.2,469Q241.4,494.4,171.7,452.9Q102,411.4,69.9,343.4Q37.8,275.4,78.9,200.6Q120,125.8,193.6,96.2Q267.2,66.6,339.8,92.8Q412.4,119,435.6,190Q458.8,261,421.6,346.8Z',
+        })));
+  }
+
+  function Hero() {
+    const containerRef = useRef();
+
+    useEffect(() => {
+      // subtle entrance animation
+      const el = containerRef.current;
+      el.classList.add('opacity-0', 'translate-y-6');
+      requestAnimationFrame(() => {
+        el.classList.remove('opacity-0');
+        el.classList.remove('translate-y-6');
+        el.classList.add('opacity-100');
+      });
+    }, []);
+
+    const mount = document.getElementById('HeroMount');
+    const registerUrl = mount.dataset.registerUrl;
+    const exploreAnchor = mount.dataset.exploreAnchor;
+
+    return h('div', { ref: containerRef, className: 'max-w-[85rem] mx-auto px-6 py-24 text-center relative' },
+      h('div', { className: 'absolute inset-0 -z-10 pointer-events-none' },
+        h(AnimatedBlob, { className: 'absolute -top-44 -left-36 w-[28rem] h-[28rem] opacity-40 blur-2xl animate-blob-slow' }),
+        h('div', { className: 'absolute top-56 right-16 w-[36rem] h-[36rem] rounded-full bg-gradient-to-bl from-pink-300 via-purple-300 to-blue-300 opacity-20 blur-3xl animate-spin-slow' })),
+
+      h('h1', { className: 'font-extrabold text-gray-900 text-4xl md:text-6xl lg:text-7xl tracking-tight leading-tight' },
+        'Connect, Learn & Share ', h('br'),
+        h('span', { className: 'bg-clip-text text-transparent bg-gradient-to-r from-blue-500 via-purple-500 to-pink-500 animate-gradient' },
+          'With Linguists Worldwide')),
+
+      h('p', { className: 'mt-6 max-w-2xl mx-auto text-lg md:text-xl text-gray-700' },
+        'Join our global community. Explore posts, share research, and grow together.'),
+
+      h('div', { className: 'mt-8 flex justify-center gap-4' },
+        h('a', {
+          href: registerUrl,
+          className: 'px-6 py-3 rounded-xl bg-blue-600 text-white text-sm md:text-base font-semibold shadow-md hover:shadow-xl hover:bg-blue-700 transition transform hover:-translate-y-1',
+        }, 'Get Started →'),
+        h('a', {
+          href: exploreAnchor,
+          className: 'px-6 py-3 rounded-xl border border-gray-300 text-gray-800 text-sm md:text-base font-semibold bg-white/50 backdrop-blur-sm hover:bg-gray-100 transition transform hover:-translate-y-1',
+        }, 'Explore Content')));
+  }
+
+  ReactDOM.createRoot(document.getElementById('HeroMount')).render(h(Hero));
+})();
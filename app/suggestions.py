@@ -0,0 +1,187 @@
+import heapq
+from array import array
+from collections import Counter
+from flask import current_app
+from sqlalchemy.orm import selectinload
+from .extensions import db
+from .models import User, UserSuggestion, followers
+
+
+def _top_n():
+    return current_app.config["SUGGESTIONS_TOP_N"]
+
+
+def _max_following():
+    return current_app.config["SUGGESTIONS_MAX_FOLLOWING"]
+
+
+class FollowGraph:
+    """The follow graph as CSR adjacency over plain int arrays.
+
+    The ids user ``u`` follows are ``targets[offsets[u]:offsets[u + 1]]``,
+    sorted. Offsets are indexed by user id directly, so lookups need no
+    id -> slot map.
+    """
+
+    def __init__(self, offsets, targets):
+        self.offsets = offsets
+        self.targets = targets
+
+    @classmethod
+    def load(cls, batch_size=10000):
+        size = (db.session.query(db.func.max(User.id)).scalar() or 0) + 2
+        offsets = array("l", bytes(size * array("l").itemsize))
+        targets = array("l")
+        rows = db.session.execute(
+            db.select(followers.c.follower_id, followers.c.followed_id)
+            .order_by(followers.c.follower_id, followers.c.followed_id)
+            .execution_options(yield_per=batch_size)
+        )
+        for follower_id, followed_id in rows:
+            targets.append(followed_id)
+            offsets[follower_id + 1] += 1
+        for u in range(1, size):
+            offsets[u] += offsets[u - 1]
+        return cls(offsets, targets)
+
+    @property
+    def user_ids(self):
+        return range(len(self.offsets) - 1)
+
+    def following(self, u):
+        return self.targets[self.offsets[u]:self.offsets[u + 1]]
+
+    def out_degree(self, u):
+        return self.offsets[u + 1] - self.offsets[u]
+
+    def suggest(self, u, top_n, max_following):
+        """Two-hop candidates for ``u`` as ``[(user_id, mutual_count)]``, most
+        mutual follows first. Accounts following more than ``max_following``
+        users are not used as a hop: they would connect everyone to everyone."""
+        following = self.following(u)
+        seen = set(following)
+        seen.add(u)
+        counts = Counter()
+        for v in following:
+            if self.out_degree(v) <= max_following:
+                counts.update(w for w in self.following(v) if w not in seen)
+        return heapq.nlargest(top_n, counts.items(), key=lambda kv: (kv[1], -kv[0]))
+
+
+def rebuild_all(batch_size=5000):
+    """Offline batch: top-N suggestions for every user. Returns users scored."""
+    graph = FollowGraph.load()
+    top_n, max_following = _top_n(), _max_following()
+
+    db.session.execute(db.delete(UserSuggestion))
+    rows, scored = [], 0
+    for u in graph.user_ids:
+        if not graph.out_degree(u):
+            continue
+        suggestions = graph.suggest(u, top_n, max_following)
+        scored += bool(suggestions)
+        rows.extend({"user_id": u, "suggested_id": w, "mutual_count": n} for w, n in suggestions)
+        if len(rows) >= batch_size:
+            db.session.execute(db.insert(UserSuggestion), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(UserSuggestion), rows)
+    db.session.commit()
+    return scored
+
+
+def _two_hop(user_ids, candidate_ids=None):
+    """SELECT of (user_id, suggested_id, mutual_count) straight from the
+    followers table, with the same hop rules as FollowGraph.suggest()."""
+    first, second, own = followers.alias("first_hop"), followers.alias("second_hop"), followers.alias("own")
+    hop = db.aliased(User)
+    query = (
+        db.select(first.c.follower_id.label("user_id"), second.c.followed_id.label("suggested_id"),
+                  db.func.count().label("mutual_count"))
+        .join(second, second.c.follower_id == first.c.followed_id)
+        .join(hop, hop.id == first.c.followed_id)
+        .where(first.c.follower_id.in_(user_ids),
+               second.c.followed_id != first.c.follower_id,
+               hop.following_count <= _max_following(),
+               ~db.exists().where(own.c.follower_id == first.c.follower_id,
+                                  own.c.followed_id == second.c.followed_id))
+        .group_by(first.c.follower_id, second.c.followed_id)
+    )
+    if candidate_ids is not None:
+        query = query.where(second.c.followed_id.in_(candidate_ids))
+    return query
+
+
+def _trim(user_ids):
+    """Keep only the top-N rows of each of ``user_ids``."""
+    rank = db.func.row_number().over(
+        partition_by=UserSuggestion.user_id,
+        order_by=(UserSuggestion.mutual_count.desc(), UserSuggestion.suggested_id),
+    ).label("rank")
+    ranked = db.select(UserSuggestion.user_id, UserSuggestion.suggested_id, rank) \
+        .where(UserSuggestion.user_id.in_(user_ids)).subquery()
+    extra = db.select(ranked.c.user_id, ranked.c.suggested_id).where(ranked.c.rank > _top_n())
+    db.session.execute(
+        db.delete(UserSuggestion)
+        .where(db.tuple_(UserSuggestion.user_id, UserSuggestion.suggested_id).in_(extra))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refresh_for(user_id):
+    """Recompute one user's suggestions from the followers table."""
+    UserSuggestion.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    rows = db.session.execute(
+        _two_hop([user_id]).order_by(db.desc("mutual_count"), "suggested_id").limit(_top_n())
+    ).mappings().all()
+    if rows:
+        db.session.execute(db.insert(UserSuggestion), [dict(r) for r in rows])
+
+
+def rescore_via(hop, target):
+    """``hop`` started or stopped following ``target``: re-count ``target``
+    for everyone following ``hop``, the only users whose two-hop view of
+    ``target`` changed. Skipped for accounts too popular to fan out to."""
+    if hop.follower_count > current_app.config["FEED_FANOUT_MAX_FOLLOWERS"]:
+        return  # picked up by the next `flask suggestions rebuild`
+    fan_ids = db.session.execute(
+        db.select(followers.c.follower_id).where(followers.c.followed_id == hop.id)
+    ).scalars().all()
+    if not fan_ids:
+        return
+    counts = {(r.user_id, r.suggested_id): r.mutual_count
+              for r in db.session.execute(_two_hop(fan_ids, [target.id]))}
+    existing = UserSuggestion.query.filter(UserSuggestion.suggested_id == target.id,
+                                           UserSuggestion.user_id.in_(fan_ids)).all()
+    # A drop can let a candidate that was cut from the top-N back in, so
+    # those users are recomputed; a rise only needs the list trimmed.
+    dropped = [row.user_id for row in existing
+               if counts.get((row.user_id, target.id), 0) < row.mutual_count]
+    for row in existing:
+        n = counts.pop((row.user_id, target.id), 0)
+        if n:
+            row.mutual_count = n
+    for (user_id, _), n in counts.items():
+        db.session.add(UserSuggestion(user_id=user_id, suggested_id=target.id, mutual_count=n))
+    db.session.flush()
+    _trim(fan_ids)
+    for user_id in dropped:
+        refresh_for(user_id)
+
+
+def on_follow_change(follower, followed):
+    """Incremental update after follow()/unfollow(); call before commit."""
+    db.session.flush()
+    refresh_for(follower.id)
+    rescore_via(follower, followed)
+
+
+def suggested_users(user, limit=5):
+    """Precomputed ``[(User, mutual_count)]``, best first: one lookup on
+    (user_id, mutual_count), no graph work."""
+    return db.session.query(User, UserSuggestion.mutual_count) \
+        .join(UserSuggestion, UserSuggestion.suggested_id == User.id) \
+        .filter(UserSuggestion.user_id == user.id) \
+        .options(selectinload(User.profile)) \
+        .order_by(UserSuggestion.mutual_count.desc(), UserSuggestion.suggested_id) \
+        .limit(limit).all()
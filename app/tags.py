@@ -0,0 +1,52 @@
+import re
+from .extensions import db
+from .models import Tag, bump_counter
+
+
+def slugify(name):
+    return re.sub(r"[^\w]+", "-", (name or "").strip().lower()).strip("-_")
+
+
+def parse_tags(raw):
+    """Split BlogForm.tags ("IPA, morphology, ipa") into unique (slug, name) pairs."""
+    seen = {}
+    for name in (raw or "").split(","):
+        name = name.strip()[:80]
+        slug = slugify(name)
+        if slug and slug not in seen:
+            seen[slug] = name
+    return seen
+
+
+def sync_blog_tags(blog):
+    """Bring blog.tag_set and the Tag.blog_count facets in line with blog.tags."""
+    wanted = parse_tags(blog.tags)
+    current = {t.slug: t for t in blog.tag_set}
+
+    for slug in current.keys() - wanted.keys():
+        blog.tag_set.remove(current[slug])
+        bump_counter(current[slug], "blog_count", -1)
+
+    added = wanted.keys() - current.keys()
+    if not added:
+        return
+    existing = {t.slug: t for t in Tag.query.filter(Tag.slug.in_(added))}
+    for slug in added:
+        tag = existing.get(slug)
+        if tag is None:
+            tag = Tag(name=wanted[slug], slug=slug, blog_count=0)
+            db.session.add(tag)
+            db.session.flush()
+        blog.tag_set.append(tag)
+        bump_counter(tag, "blog_count")
+
+
+def clear_blog_tags(blog):
+    for tag in list(blog.tag_set):
+        bump_counter(tag, "blog_count", -1)
+    blog.tag_set = []
+
+
+def tag_cloud(limit=30):
+    return Tag.query.filter(Tag.blog_count > 0) \
+        .order_by(Tag.blog_count.desc(), Tag.name).limit(limit).all()
@@ -0,0 +1,105 @@
+import atexit
+import os
+import threading
+from .extensions import db
+from .models import Blog
+
+
+class ViewCounter:
+    """Write-behind buffer for blog view counts.
+
+    Increments accumulate in process memory and a background thread writes
+    them as one batched UPDATE every VIEW_FLUSH_INTERVAL seconds, or as soon
+    as VIEW_FLUSH_THRESHOLD views are pending, and again at shutdown.
+    Requests only touch the buffer, so reading a blog never waits on
+    SQLite's writer lock; a failed flush is logged and retried later.
+    """
+
+    def __init__(self, app=None):
+        self._pending = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self.threshold = 100
+        self.interval = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        self.threshold = app.config["VIEW_FLUSH_THRESHOLD"]
+        self.interval = app.config["VIEW_FLUSH_INTERVAL"]
+        atexit.register(self._flush_logged)
+
+    def record(self, blog_id):
+        """Count one view."""
+        with self._lock:
+            self._pending[blog_id] = self._pending.get(blog_id, 0) + 1
+            self._total += 1
+            due = self._total >= self.threshold
+            self._start()
+        if due:
+            self._wake.set()
+
+    def _start(self):
+        # Started by the first view rather than init_app, so CLI commands
+        # run no thread and forked server workers each start their own.
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush_logged()
+
+    def _flush_logged(self):
+        with self._app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                self._app.logger.warning("Blog view flush failed; views kept for the next one",
+                                         exc_info=True)
+
+    def pending(self, blog_id):
+        return self._pending.get(blog_id, 0)
+
+    def views(self, blog):
+        """Stored views plus the increments not flushed yet."""
+        return (blog.views or 0) + self.pending(blog.id)
+
+    def flush(self):
+        """Write all pending increments in one UPDATE; returns views written.
+
+        On failure the batch goes back into the buffer and the error is
+        re-raised.
+        """
+        with self._lock:
+            batch, self._pending, self._total = self._pending, {}, 0
+        if not batch:
+            return 0
+        try:
+            # Own short transaction, independent of the request's session.
+            # updated_at is pinned so a view does not count as an edit.
+            with db.engine.begin() as conn:
+                conn.execute(
+                    db.update(Blog)
+                    .where(Blog.id.in_(batch))
+                    .values(views=db.func.coalesce(Blog.views, 0) + db.case(batch, value=Blog.id, else_=0),
+                            updated_at=Blog.updated_at)
+                )
+        except Exception:
+            with self._lock:
+                for blog_id, n in batch.items():
+                    self._pending[blog_id] = self._pending.get(blog_id, 0) + n
+                    self._total += n
+            raise
+        return sum(batch.values())
+
+
+view_counter = ViewCounter()
@@ -94,6 +94,15 @@ def run_migrations_online():
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
+    # SQLite FTS5 tables (and their shadow tables) are created by hand in
+    # migrations; keep autogenerate from trying to drop them
+    def include_name(name, type_, parent_names):
+        if type_ == "table":
+            return "_fts" not in name
+        return True
+
+    conf_args.setdefault("include_name", include_name)
+
     connectable = get_engine()
 
     with connectable.connect() as connection:
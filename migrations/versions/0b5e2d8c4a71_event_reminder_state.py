@@ -0,0 +1,28 @@
+"""event reminder state
+
+Revision ID: 0b5e2d8c4a71
+Revises: f1a7c3d59e28
+Create Date: 2026-10-18 20:02:17.385520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b5e2d8c4a71'
+down_revision = 'f1a7c3d59e28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('event_registration', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reminded_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_event_registration_event_reminded', ['event_id', 'reminded_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('event_registration', schema=None) as batch_op:
+        batch_op.drop_index('ix_event_registration_event_reminded')
+        batch_op.drop_column('reminded_at')
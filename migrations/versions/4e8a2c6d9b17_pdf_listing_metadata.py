@@ -0,0 +1,42 @@
+"""pdf listing metadata
+
+Revision ID: 4e8a2c6d9b17
+Revises: 9c5b1f7e3a20
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8a2c6d9b17'
+down_revision = '9c5b1f7e3a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows get their page counts from the next `flask library index`
+    # run (every blob is pending after the text-search migration)
+    with op.batch_alter_table('admin_pdf', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('page_count', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_admin_pdf_title', ['title'], unique=False)
+        batch_op.create_index(batch_op.f('ix_admin_pdf_uploaded_at'), ['uploaded_at'], unique=False)
+
+    with op.batch_alter_table('user_pdf', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('page_count', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_user_pdf_title', ['title'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_pdf_uploaded_at'), ['uploaded_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_pdf', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_pdf_uploaded_at'))
+        batch_op.drop_index('ix_user_pdf_title')
+        batch_op.drop_column('page_count')
+
+    with op.batch_alter_table('admin_pdf', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_admin_pdf_uploaded_at'))
+        batch_op.drop_index('ix_admin_pdf_title')
+        batch_op.drop_column('page_count')
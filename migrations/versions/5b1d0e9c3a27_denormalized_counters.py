@@ -0,0 +1,55 @@
+"""denormalized like/comment/follower counters
+
+Revision ID: 5b1d0e9c3a27
+Revises: f7c6e74244c6
+Create Date: 2026-10-18 09:12:44.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1d0e9c3a27'
+down_revision = 'f7c6e74244c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('following_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the existing rows
+    op.execute('UPDATE "user" SET '
+               'follower_count = (SELECT COUNT(*) FROM followers WHERE followed_id = "user".id), '
+               'following_count = (SELECT COUNT(*) FROM followers WHERE follower_id = "user".id)')
+    op.execute('UPDATE post SET '
+               'like_count = (SELECT COUNT(*) FROM post_like WHERE post_id = post.id), '
+               'comment_count = (SELECT COUNT(*) FROM post_comment WHERE post_id = post.id)')
+    op.execute('UPDATE blog SET '
+               'like_count = (SELECT COUNT(*) FROM blog_like WHERE blog_id = blog.id), '
+               'comment_count = (SELECT COUNT(*) FROM blog_comment WHERE blog_id = blog.id)')
+
+
+def downgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_column('comment_count')
+        batch_op.drop_column('like_count')
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('comment_count')
+        batch_op.drop_column('like_count')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('following_count')
+        batch_op.drop_column('follower_count')
@@ -0,0 +1,46 @@
+"""content-addressed pdf storage
+
+Revision ID: 8a3e6c0f2d94
+Revises: 7d2f9b4e1c63
+Create Date: 2026-10-18 22:41:06.553179
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3e6c0f2d94'
+down_revision = '7d2f9b4e1c63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pdf_blob',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    for table in ('admin_pdf', 'user_pdf'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+            batch_op.add_column(sa.Column('size', sa.BigInteger(), nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_{table}_sha256'), ['sha256'], unique=False)
+            batch_op.create_foreign_key(f'fk_{table}_sha256_pdf_blob', 'pdf_blob', ['sha256'], ['sha256'])
+
+    # Existing files stay under their upload names until
+    # `flask library migrate-blobs` moves them into blob storage
+
+
+def downgrade():
+    for table in ('user_pdf', 'admin_pdf'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_sha256_pdf_blob', type_='foreignkey')
+            batch_op.drop_index(batch_op.f(f'ix_{table}_sha256'))
+            batch_op.drop_column('size')
+            batch_op.drop_column('sha256')
+
+    op.drop_table('pdf_blob')
@@ -0,0 +1,56 @@
+"""pdf page text search
+
+Revision ID: 9c5b1f7e3a20
+Revises: 8a3e6c0f2d94
+Create Date: 2026-10-18 23:27:54.902731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c5b1f7e3a20'
+down_revision = '8a3e6c0f2d94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pdf_page',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('page', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('pdf_page', schema=None) as batch_op:
+        batch_op.create_index('ix_pdf_page_sha256_page', ['sha256', 'page'], unique=False)
+
+    # Existing blobs start out pending, so `flask library index` picks them up
+    with op.batch_alter_table('pdf_blob', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('text_status', sa.String(length=16), server_default='pending', nullable=False))
+        batch_op.add_column(sa.Column('text_pages', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('text_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('text_updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_pdf_blob_text_status', ['text_status', 'text_updated_at'], unique=False)
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS pdf_page_fts USING fts5("
+        "body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS pdf_page_fts")
+
+    with op.batch_alter_table('pdf_blob', schema=None) as batch_op:
+        batch_op.drop_index('ix_pdf_blob_text_status')
+        batch_op.drop_column('text_updated_at')
+        batch_op.drop_column('text_error')
+        batch_op.drop_column('text_pages')
+        batch_op.drop_column('text_status')
+
+    with op.batch_alter_table('pdf_page', schema=None) as batch_op:
+        batch_op.drop_index('ix_pdf_page_sha256_page')
+
+    op.drop_table('pdf_page')
@@ -0,0 +1,50 @@
+"""following timeline
+
+Revision ID: 9e4c2f71d0b8
+Revises: 5b1d0e9c3a27
+Create Date: 2026-10-18 10:03:17.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4c2f71d0b8'
+down_revision = '5b1d0e9c3a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('timeline',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    with op.batch_alter_table('timeline', schema=None) as batch_op:
+        batch_op.create_index('ix_timeline_user_created', ['user_id', 'created_at', 'post_id'], unique=False)
+        batch_op.create_index('ix_timeline_user_author', ['user_id', 'author_id'], unique=False)
+        batch_op.create_index('ix_timeline_post_id', ['post_id'], unique=False)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_user_created', ['user_id', 'created_at'], unique=False)
+
+    # Seed timelines with what everyone already follows, plus their own posts
+    op.execute('INSERT INTO timeline (user_id, post_id, author_id, created_at) '
+               'SELECT f.follower_id, p.id, p.user_id, p.created_at '
+               'FROM followers f JOIN post p ON p.user_id = f.followed_id')
+    op.execute('INSERT OR IGNORE INTO timeline (user_id, post_id, author_id, created_at) '
+               'SELECT p.user_id, p.id, p.user_id, p.created_at FROM post p')
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_user_created')
+
+    op.drop_table('timeline')
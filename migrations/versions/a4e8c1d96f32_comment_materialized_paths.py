@@ -0,0 +1,65 @@
+"""comment materialized paths
+
+Revision ID: a4e8c1d96f32
+Revises: f3d62b8a1e57
+Create Date: 2026-10-18 16:10:42.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e8c1d96f32'
+down_revision = 'f3d62b8a1e57'
+branch_labels = None
+depends_on = None
+
+
+def _backfill(table):
+    """Compute path/depth for existing comments (see app/comments.py)."""
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(f"SELECT id, parent_id FROM {table} ORDER BY id")).all()
+    parents = dict(rows)
+    paths, depths = {}, {}
+
+    def walk(comment_id):
+        if comment_id not in paths:
+            chain, cur = [], comment_id
+            while cur is not None and cur not in paths and cur in parents:
+                chain.append(cur)
+                cur = parents[cur]
+            prefix, depth = (paths[cur], depths[cur] + 1) if cur in paths else ("", 0)
+            for cid in reversed(chain):
+                prefix += f"{cid:08d}/"
+                paths[cid], depths[cid] = prefix, depth
+                depth += 1
+        return paths[comment_id]
+
+    for comment_id, _ in rows:
+        walk(comment_id)
+    if rows:
+        conn.execute(
+            sa.text(f"UPDATE {table} SET path = :path, depth = :depth WHERE id = :id"),
+            [{"id": cid, "path": paths[cid], "depth": depths[cid]} for cid, _ in rows],
+        )
+
+
+def upgrade():
+    for table, owner in (('post_comment', 'post_id'), ('blog_comment', 'blog_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('path', sa.String(length=255), nullable=False, server_default=''))
+            batch_op.add_column(sa.Column('depth', sa.Integer(), nullable=False, server_default='0'))
+        _backfill(table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('path', server_default=None)
+            batch_op.alter_column('depth', server_default=None)
+            batch_op.create_index(f'ix_{table}_{owner.split("_")[0]}_path', [owner, 'path'], unique=False)
+
+
+def downgrade():
+    for table, owner in (('blog_comment', 'blog_id'), ('post_comment', 'post_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_{owner.split("_")[0]}_path')
+            batch_op.drop_column('depth')
+            batch_op.drop_column('path')
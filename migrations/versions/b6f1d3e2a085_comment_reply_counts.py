@@ -0,0 +1,35 @@
+"""comment reply counts
+
+Revision ID: b6f1d3e2a085
+Revises: a4e8c1d96f32
+Create Date: 2026-10-18 16:48:05.772391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f1d3e2a085'
+down_revision = 'a4e8c1d96f32'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, owner in (('post_comment', 'post_id'), ('blog_comment', 'blog_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.create_index(f'ix_{table}_{owner[:-3]}_parent_created', [owner, 'parent_id', 'created_at', 'id'], unique=False)
+
+        op.execute(
+            f"UPDATE {table} SET reply_count = "
+            f"(SELECT COUNT(*) FROM {table} AS reply WHERE reply.parent_id = {table}.id)"
+        )
+
+
+def downgrade():
+    for table, owner in (('blog_comment', 'blog_id'), ('post_comment', 'post_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_{owner[:-3]}_parent_created')
+            batch_op.drop_column('reply_count')
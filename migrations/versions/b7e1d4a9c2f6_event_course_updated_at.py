@@ -0,0 +1,33 @@
+"""event and course updated_at
+
+Revision ID: b7e1d4a9c2f6
+Revises: 4e8a2c6d9b17
+Create Date: 2026-10-20 14:03:17.552918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e1d4a9c2f6'
+down_revision = '4e8a2c6d9b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Part of the detail pages' ETags (see app.decorators.conditional)
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
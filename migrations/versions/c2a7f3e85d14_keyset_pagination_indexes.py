@@ -0,0 +1,43 @@
+"""keyset pagination indexes
+
+Revision ID: c2a7f3e85d14
+Revises: 9e4c2f71d0b8
+Create Date: 2026-10-18 11:26:02.771448
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2a7f3e85d14'
+down_revision = '9e4c2f71d0b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_created_id', ['created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.create_index('ix_blog_created_id', ['created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.create_index('ix_event_date_id', ['date', 'id'], unique=False)
+
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.create_index('ix_course_created_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.drop_index('ix_course_created_id')
+
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_index('ix_event_date_id')
+
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_index('ix_blog_created_id')
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_created_id')
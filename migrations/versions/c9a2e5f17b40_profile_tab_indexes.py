@@ -0,0 +1,31 @@
+"""profile tab indexes
+
+Revision ID: c9a2e5f17b40
+Revises: b6f1d3e2a085
+Create Date: 2026-10-18 17:20:13.604118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a2e5f17b40'
+down_revision = 'b6f1d3e2a085'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.create_index('ix_blog_user_created', ['user_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('user_pdf', schema=None) as batch_op:
+        batch_op.create_index('ix_user_pdf_user_uploaded', ['user_id', 'uploaded_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_pdf', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_pdf_user_uploaded')
+
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_index('ix_blog_user_created')
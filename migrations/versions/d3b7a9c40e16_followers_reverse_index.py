@@ -0,0 +1,25 @@
+"""followers reverse index
+
+Revision ID: d3b7a9c40e16
+Revises: c9a2e5f17b40
+Create Date: 2026-10-18 17:52:31.240967
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b7a9c40e16'
+down_revision = 'c9a2e5f17b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('followers', schema=None) as batch_op:
+        batch_op.create_index('ix_followers_followed_follower', ['followed_id', 'follower_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('followers', schema=None) as batch_op:
+        batch_op.drop_index('ix_followers_followed_follower')
@@ -0,0 +1,41 @@
+"""blog full-text search
+
+Revision ID: d81b5a0c6e93
+Revises: c2a7f3e85d14
+Create Date: 2026-10-18 12:40:51.306127
+
+"""
+import re
+from html import unescape
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81b5a0c6e93'
+down_revision = 'c2a7f3e85d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS blog_fts USING fts5("
+        "title, body, tags, category, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+    # Backfill; `flask search rebuild-blogs` re-does this with the app's stripper
+    conn = op.get_bind()
+    for id_, title, body, tags, category in conn.execute(
+            sa.text("SELECT id, title, body, tags, category FROM blog")):
+        text = re.sub(r"\s+", " ", unescape(re.sub(r"<[^>]+>", " ", body or ""))).strip()
+        conn.execute(
+            sa.text("INSERT INTO blog_fts (rowid, title, body, tags, category) "
+                    "VALUES (:id, :title, :body, :tags, :category)"),
+            {"id": id_, "title": title, "body": text, "tags": tags or "", "category": category or ""},
+        )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS blog_fts")
@@ -0,0 +1,77 @@
+"""normalized blog tags
+
+Revision ID: e5f0a9b47c21
+Revises: d81b5a0c6e93
+Create Date: 2026-10-18 13:55:09.662381
+
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f0a9b47c21'
+down_revision = 'd81b5a0c6e93'
+branch_labels = None
+depends_on = None
+
+
+def _slugify(name):
+    return re.sub(r"[^\w]+", "-", name.strip().lower()).strip("-_")
+
+
+def upgrade():
+    op.create_table('tag',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=80), nullable=False),
+    sa.Column('slug', sa.String(length=80), nullable=False),
+    sa.Column('blog_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tag_slug'), ['slug'], unique=True)
+        batch_op.create_index(batch_op.f('ix_tag_blog_count'), ['blog_count'], unique=False)
+
+    op.create_table('blog_tag',
+    sa.Column('blog_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['blog_id'], ['blog.id'], ),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+    sa.PrimaryKeyConstraint('blog_id', 'tag_id')
+    )
+    with op.batch_alter_table('blog_tag', schema=None) as batch_op:
+        batch_op.create_index('ix_blog_tag_tag_blog', ['tag_id', 'blog_id'], unique=False)
+
+    # Backfill from the comma-separated blog.tags column
+    conn = op.get_bind()
+    tag_ids = {}
+    for blog_id, raw in conn.execute(sa.text("SELECT id, tags FROM blog WHERE tags IS NOT NULL")):
+        slugs = {}
+        for name in raw.split(","):
+            name = name.strip()[:80]
+            slug = _slugify(name)
+            if slug and slug not in slugs:
+                slugs[slug] = name
+        for slug, name in slugs.items():
+            if slug not in tag_ids:
+                tag_ids[slug] = conn.execute(
+                    sa.text("INSERT INTO tag (name, slug, blog_count) VALUES (:name, :slug, 0)"),
+                    {"name": name, "slug": slug},
+                ).lastrowid
+            conn.execute(sa.text("INSERT INTO blog_tag (blog_id, tag_id) VALUES (:b, :t)"),
+                         {"b": blog_id, "t": tag_ids[slug]})
+
+    op.execute("UPDATE tag SET blog_count = (SELECT COUNT(*) FROM blog_tag WHERE tag_id = tag.id)")
+
+
+def downgrade():
+    with op.batch_alter_table('blog_tag', schema=None) as batch_op:
+        batch_op.drop_index('ix_blog_tag_tag_blog')
+
+    op.drop_table('blog_tag')
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tag_blog_count'))
+        batch_op.drop_index(batch_op.f('ix_tag_slug'))
+
+    op.drop_table('tag')
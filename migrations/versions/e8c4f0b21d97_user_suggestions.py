@@ -0,0 +1,40 @@
+"""user suggestions
+
+Revision ID: e8c4f0b21d97
+Revises: d3b7a9c40e16
+Create Date: 2026-10-18 18:34:57.091425
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c4f0b21d97'
+down_revision = 'd3b7a9c40e16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_suggestion',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('suggested_id', sa.Integer(), nullable=False),
+    sa.Column('mutual_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['suggested_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'suggested_id')
+    )
+    with op.batch_alter_table('user_suggestion', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_suggestion_suggested_id'), ['suggested_id'], unique=False)
+        batch_op.create_index('ix_user_suggestion_user_mutual', ['user_id', 'mutual_count'], unique=False)
+
+    # Existing users get their suggestions from `flask suggestions rebuild`.
+
+
+def downgrade():
+    with op.batch_alter_table('user_suggestion', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_suggestion_user_mutual')
+        batch_op.drop_index(batch_op.f('ix_user_suggestion_suggested_id'))
+
+    op.drop_table('user_suggestion')
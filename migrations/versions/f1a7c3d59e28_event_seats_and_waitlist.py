@@ -0,0 +1,49 @@
+"""event seats and waitlist
+
+Revision ID: f1a7c3d59e28
+Revises: e8c4f0b21d97
+Create Date: 2026-10-18 19:21:40.558813
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a7c3d59e28'
+down_revision = 'e8c4f0b21d97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_waitlist',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'event_id', name='uq_waitlist_event_user')
+    )
+    with op.batch_alter_table('event_waitlist', schema=None) as batch_op:
+        batch_op.create_index('ix_event_waitlist_event_created', ['event_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seats_taken', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(
+        "UPDATE event SET seats_taken = "
+        "(SELECT COUNT(*) FROM event_registration WHERE event_registration.event_id = event.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_column('seats_taken')
+
+    with op.batch_alter_table('event_waitlist', schema=None) as batch_op:
+        batch_op.drop_index('ix_event_waitlist_event_created')
+
+    op.drop_table('event_waitlist')
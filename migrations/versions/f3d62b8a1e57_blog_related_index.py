@@ -0,0 +1,43 @@
+"""blog related index
+
+Revision ID: f3d62b8a1e57
+Revises: e5f0a9b47c21
+Create Date: 2026-10-18 15:02:36.914550
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3d62b8a1e57'
+down_revision = 'e5f0a9b47c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blog_related',
+    sa.Column('blog_id', sa.Integer(), nullable=False),
+    sa.Column('related_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['blog_id'], ['blog.id'], ),
+    sa.ForeignKeyConstraint(['related_id'], ['blog.id'], ),
+    sa.PrimaryKeyConstraint('blog_id', 'related_id')
+    )
+    with op.batch_alter_table('blog_related', schema=None) as batch_op:
+        batch_op.create_index('ix_blog_related_blog_score', ['blog_id', 'score'], unique=False)
+        batch_op.create_index(batch_op.f('ix_blog_related_related_id'), ['related_id'], unique=False)
+
+    # Document frequencies for incremental updates (read-only view of blog_fts).
+    # Existing blogs get their neighbours from `flask related rebuild`.
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS blog_fts_vocab USING fts5vocab(blog_fts, 'row')")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS blog_fts_vocab")
+    with op.batch_alter_table('blog_related', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_blog_related_related_id'))
+        batch_op.drop_index('ix_blog_related_blog_score')
+
+    op.drop_table('blog_related')
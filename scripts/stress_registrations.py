@@ -0,0 +1,97 @@
+"""Race event sign-ups and cancellations from threads on a scratch SQLite
+database and check that the event is never overbooked.
+
+    python scripts/stress_registrations.py [--users 300] [--capacity 50] [--cancellations 25]
+
+Exits non-zero on overbooking, seat counter drift, or a lost or duplicated
+waitlist promotion.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, seats  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import Event, EventRegistration, User  # noqa: E402
+
+
+@click.command()
+@click.option("--users", default=300, show_default=True, help="Concurrent sign-ups.")
+@click.option("--capacity", default=50, show_default=True)
+@click.option("--cancellations", default=25, show_default=True, help="Concurrent cancellations afterwards.")
+def main(users, capacity, cancellations):
+    workdir = tempfile.mkdtemp()
+    try:
+        run(workdir, users, capacity, cancellations)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(workdir, users, capacity, cancellations):
+    class StressConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(workdir, "stress.db")
+        SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 60}, "pool_size": 64, "max_overflow": 0}
+
+    app = create_app(StressConfig)
+    with app.app_context():
+        db.create_all()
+        event = Event(title="Stress", description="-", date=datetime.utcnow(), capacity=capacity)
+        db.session.add(event)
+        db.session.add_all(User(username=f"stress{i}", email=f"stress{i}@example.invalid", password_hash="-")
+                           for i in range(users))
+        db.session.commit()
+        event_id, user_ids = event.id, [u.id for u in User.query.order_by(User.id)]
+
+    def race(action, ids):
+        barrier = threading.Barrier(len(ids))
+
+        def worker(user_id):
+            with app.app_context():
+                barrier.wait()
+                return action(db.session.get(Event, event_id), db.session.get(User, user_id))
+
+        with ThreadPoolExecutor(max_workers=len(ids)) as pool:
+            return list(pool.map(worker, ids))
+
+    def check(label):
+        with app.app_context():
+            event = db.session.get(Event, event_id)
+            registered = event.registrations.count()
+            waiting = event.waitlist.count()
+        click.echo(f"{label}: {registered} registered, seats_taken={event.seats_taken}, "
+                   f"{waiting} waitlisted (capacity {capacity})")
+        if registered > capacity or registered != event.seats_taken:
+            raise click.ClickException("overbooked or seat counter drifted")
+        return registered, waiting
+
+    results = race(seats.reserve, user_ids)
+    # A second burst of the same users must be rejected as duplicates
+    results += race(seats.reserve, user_ids)
+    click.echo(", ".join(f"{n} {r}" for r, n in Counter(results).items()))
+    registered, waiting = check("after sign-ups")
+    if registered != min(users, capacity) or waiting != users - registered:
+        raise click.ClickException("sign-ups were lost")
+
+    with app.app_context():
+        holders = [r.user_id for r in EventRegistration.query.filter_by(event_id=event_id)]
+    cancelled = holders[:cancellations]
+    if cancelled:
+        race(seats.cancel, cancelled)
+    registered_after, waiting_after = check("after cancellations")
+    promoted = min(len(cancelled), waiting)
+    if registered_after != registered - len(cancelled) + promoted or waiting_after != waiting - promoted:
+        raise click.ClickException("waitlist promotion lost or duplicated seats")
+    click.echo("OK: no overbooking")
+
+
+if __name__ == "__main__":
+    main()